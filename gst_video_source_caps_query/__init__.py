@@ -1 +1,74 @@
-from .gst_video_source_caps_query import *
+'''
+Names of the main module (e.g., `GstVideoSourceManager`) are loaded on first
+access, so that importing the package, or its GStreamer-free submodules
+(`formats`, `cache`, `caps_index`, `mode_index`, `ranges`, `ranking`, ...),
+does not initialise GStreamer.  Only the `elements` module (e.g.,
+`FilteredInput`), and the modules using it, load GStreamer.
+'''
+from importlib import import_module
+import sys
+from types import ModuleType
+
+from .formats import Fps, format_cap, get_caps_string
+
+
+# Submodules, imported on first access as attributes of the package (e.g.,
+# by `from gst_video_source_caps_query import cache`).
+SUBMODULES = ('async_result', 'backends', 'bandwidth', 'benchmark', 'cache',
+              'caps_index', 'conversion', 'elements', 'fingerprint',
+              'formats', 'frame_ring', 'gst_video_source_caps_query',
+              'hotplug', 'inventory', 'mode_index', 'mode_table',
+              'pipeline_stats', 'ranges', 'ranking', 'sysfs', 'verify',
+              'video_mode_dialog')
+
+# Exported names, by the submodule defining them.
+EXPORTS = {'gst_video_source_caps_query':
+           ('DeviceNotFound', 'get_available_video_modes',
+            'get_video_source_configs', 'is_ignored_device',
+            'probe_device_records', 'get_video_source_factory',
+            'is_gst_value', 'GstVideoSourceManager',
+            'GstVideoSourceCapabilities', 'StoredVideoSourceCapabilities',
+            'parse_args', 'iter_mode_records', 'write_mode_records', 'main',
+            'test'),
+           'elements': ('ProbeError', 'CapsProbe', 'get_caps_probe',
+                        'DELIVERY_POLICIES', 'get_delivery_queue',
+                        'FilteredInput', 'FanOut'),
+           'backends': ('GstDeviceBackend', ),
+           'cache': ('CapsCache', ),
+           'caps_index': ('CapsIndex', 'CapsRecord'),
+           'conversion': ('get_conversion_elements', ),
+           'fingerprint': ('canonical_modes', 'diff_devices', 'fingerprint'),
+           'mode_index': ('ModeIndex', ),
+           'ranges': ('FractionRange', 'IntRange', 'ModeSpace')}
+
+_EXPORT_MODULES = dict([(name, module_name)
+                        for module_name, names in EXPORTS.iteritems()
+                        for name in names])
+
+
+class _LazyModule(ModuleType):
+    def __getattr__(self, name):
+        if name == '__all__':
+            # Support `from gst_video_source_caps_query import *`.
+            value = sorted(set(['Fps', 'format_cap', 'get_caps_string'] +
+                               _EXPORT_MODULES.keys()))
+        elif name in SUBMODULES:
+            return import_module('.' + name, self.__name__)
+        elif name in _EXPORT_MODULES:
+            module = import_module('.' + _EXPORT_MODULES[name],
+                                   self.__name__)
+            value = getattr(module, name)
+        else:
+            raise AttributeError, "'module' object has no attribute '%s'" % \
+                    name
+        setattr(self, name, value)
+        return value
+
+
+_original_module = sys.modules[__name__]
+_lazy_module = _LazyModule(__name__, __doc__)
+_lazy_module.__dict__.update(_original_module.__dict__)
+# Keep the original module alive: its namespace holds the globals of the
+# code above.
+_lazy_module._original_module = _original_module
+sys.modules[__name__] = _lazy_module
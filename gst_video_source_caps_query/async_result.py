@@ -0,0 +1,70 @@
+import threading
+
+from multiprocessing import TimeoutError
+
+
+class AsyncResult(object):
+    '''
+    Result of a request that completes in another thread or process.
+
+    Follows the interface of :class:`multiprocessing.pool.AsyncResult`,
+    with the addition of :meth:`add_done_callback` for integration with
+    event loops (e.g., by scheduling the callback with `glib.idle_add`).
+    '''
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._value = None
+        self._exception = None
+
+    def ready(self):
+        return self._event.is_set()
+
+    def successful(self):
+        if not self.ready():
+            raise ValueError('%r not ready' % self)
+        return self._exception is None
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+
+    def get(self, timeout=None):
+        '''
+        Return the result, or raise its exception.  Raises
+        :class:`multiprocessing.TimeoutError` if the result is not ready
+        within `timeout` seconds.
+        '''
+        if not self._event.wait(timeout):
+            raise TimeoutError
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+    def add_done_callback(self, callback):
+        '''
+        Call `callback(self)` once the result is ready (immediately if it
+        already is).  Callbacks run in the thread setting the result.
+        '''
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _set(self, value, exception):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._value = value
+            self._exception = exception
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def set_result(self, value):
+        self._set(value, None)
+
+    def set_exception(self, exception):
+        self._set(None, exception)
@@ -0,0 +1,138 @@
+import time
+
+
+class DeviceBackend(object):
+    '''
+    Source of video devices for :class:`GstVideoSourceManager`.
+
+    Backends must be picklable, since they are passed to worker processes
+    when probing in parallel.
+    '''
+    # Element property used to select the device (`None` if unused).
+    device_key = None
+    # Directory listing the devices, if any (watched by `DeviceWatcher`).
+    by_id_dir = None
+
+    def list_devices(self):
+        '''
+        Return the list of available devices, or raise `DeviceNotFound`.
+        '''
+        raise NotImplementedError
+
+    def get_identity(self, video_device):
+        '''
+        Return a JSON-serializable identity for `video_device`, used to
+        invalidate cached caps.
+        '''
+        return {'name': video_device}
+
+    def probe(self, video_device):
+        '''
+        Return the capabilities of `video_device`, or `None` if it could not
+        be queried.
+        '''
+        raise NotImplementedError
+
+
+class GstDeviceBackend(DeviceBackend):
+    '''
+    Hardware devices: `v4l2src` devices listed in `by_id_dir` on Linux,
+    `dshowvideosrc` devices elsewhere.
+
+    Devices are probed through the shared :class:`CapsProbe` of the
+    current process.
+    '''
+    def __init__(self, by_id_dir='/dev/v4l/by-id'):
+        self.by_id_dir = by_id_dir
+
+    @property
+    def source_factory(self):
+        from .gst_video_source_caps_query import get_video_source_factory
+
+        return get_video_source_factory()
+
+    def list_devices(self):
+        from .gst_video_source_caps_query import get_video_source_configs
+
+        self.device_key, devices = get_video_source_configs(self.by_id_dir)
+        return devices
+
+    def get_identity(self, video_device):
+        from .sysfs import device_identity
+
+        if self.device_key == 'device':
+            return device_identity(video_device)
+        return {'name': video_device}
+
+    def probe(self, video_device):
+        from .elements import ProbeError, get_caps_probe, gst
+        from .gst_video_source_caps_query import GstVideoSourceCapabilities
+
+        caps_probe = get_caps_probe()
+        video_source = caps_probe.get_source(self.source_factory,
+                                             self.device_key, video_device)
+        try:
+            return GstVideoSourceCapabilities(video_source, caps_probe)
+        except (gst.LinkError, ProbeError):
+            return None
+
+
+class VideoTestSrcBackend(GstDeviceBackend):
+    '''
+    `device_count` synthetic devices, each backed by a `videotestsrc`
+    element.
+    '''
+    source_factory = 'videotestsrc'
+
+    def __init__(self, device_count=1):
+        self.device_count = device_count
+
+    def list_devices(self):
+        return ['videotestsrc-%d' % i for i in xrange(self.device_count)]
+
+    def get_identity(self, video_device):
+        return {'name': video_device}
+
+
+class SyntheticBackend(DeviceBackend):
+    '''
+    `device_count` fake devices, each reporting `caps_count` caps
+    structures, without touching GStreamer.
+
+    `probe_delay` seconds are spent in each probe to simulate the device
+    open.  Used for benchmarks and for testing without cameras.
+    '''
+    fourccs = (('video/x-raw-yuv', 'YUY2'), ('image/jpeg', 'MJPG'),
+               ('video/x-raw-yuv', 'I420'), ('video/x-raw-rgb', 'RGB3'))
+    framerates = ([30, 1], [25, 1], [15, 1], [10, 1], [5, 1])
+
+    def __init__(self, device_count=1, caps_count=16, probe_delay=0.):
+        self.device_count = device_count
+        self.caps_count = caps_count
+        self.probe_delay = probe_delay
+
+    def list_devices(self):
+        return ['/dev/synthetic/video%d' % i
+                for i in xrange(self.device_count)]
+
+    def get_records(self):
+        records = []
+        for i in xrange(self.caps_count):
+            name, fourcc = self.fourccs[i % len(self.fourccs)]
+            # Distinct dimensions for each group of formats.
+            size = i // len(self.fourccs)
+            records.append({'name': name, 'fourcc': fourcc,
+                            'width': 160 + 16 * size,
+                            'height': 120 + 12 * size,
+                            'framerates': list(self.framerates[:1 + i % 5])})
+        return records
+
+    def probe(self, video_device):
+        from .gst_video_source_caps_query import StoredVideoSourceCapabilities
+
+        start = time.time()
+        if self.probe_delay:
+            time.sleep(self.probe_delay)
+        video_caps = StoredVideoSourceCapabilities(self.get_records())
+        video_caps.probe_duration = time.time() - start
+        return video_caps
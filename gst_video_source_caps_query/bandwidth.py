@@ -0,0 +1,167 @@
+from __future__ import division
+from collections import OrderedDict, namedtuple
+import os
+import re
+
+from .formats import FOURCC_BITS_PER_PIXEL, is_compressed
+from .ranking import ModeRanker, get_fps
+from .sysfs import _read, get_video4linux_dir
+
+
+# Assumed size of compressed frames, relative to 16 bits per pixel.
+COMPRESSION_RATIO = .25
+# Fraction of the bus bandwidth available to periodic (isochronous)
+# transfers, per the USB 2.0 specification.
+PERIODIC_FRACTION = .8
+
+Allocation = namedtuple('Allocation', 'modes usage')
+
+
+def estimate_bandwidth(video_mode, compression_ratio=COMPRESSION_RATIO):
+    '''
+    Return the estimated bandwidth of `video_mode` in bytes per second.
+    '''
+    fourcc = video_mode['fourcc']
+    if is_compressed(fourcc):
+        bits_per_pixel = 16 * compression_ratio
+    else:
+        bits_per_pixel = FOURCC_BITS_PER_PIXEL.get(fourcc, 16)
+    return (video_mode['width'] * video_mode['height'] * bits_per_pixel / 8 *
+            get_fps(video_mode))
+
+
+def get_usb_bus(device, sysfs_root='/sys'):
+    '''
+    Return `(bus, speed)` of the USB bus (i.e., root hub) `device` is
+    attached to, with `speed` in Mbit/s, or `None` if `device` is not a USB
+    device.
+    '''
+    device_dir = os.path.join(get_video4linux_dir(device, sysfs_root),
+                              'device')
+    if not os.path.exists(device_dir):
+        return None
+    bus_dir = None
+    for directory in _iter_parents(os.path.realpath(device_dir)):
+        if re.match(r'usb\d+$', os.path.basename(directory)):
+            bus_dir = directory
+            break
+    if bus_dir is None:
+        return None
+    speed = _read(os.path.join(bus_dir, 'speed'))
+    return os.path.basename(bus_dir), float(speed) if speed else 480.
+
+
+def _iter_parents(directory):
+    while True:
+        yield directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
+
+def get_bus_budget(speed, periodic_fraction=PERIODIC_FRACTION):
+    '''
+    Return the bandwidth (in bytes per second) available to video streams on
+    a bus of `speed` Mbit/s.
+    '''
+    return speed * 1e6 / 8 * periodic_fraction
+
+
+def _pareto_modes(modes, bandwidths, qualities):
+    '''
+    Return `(bandwidth, quality, mode)` for the modes that no cheaper mode
+    matches in quality, sorted by bandwidth.
+    '''
+    candidates = sorted(zip(bandwidths, qualities, modes),
+                        key=lambda c: (c[0], -c[1]))
+    frontier = []
+    for bandwidth, quality, mode in candidates:
+        if not frontier or quality > frontier[-1][1]:
+            frontier.append((bandwidth, quality, mode))
+    return frontier
+
+
+def _solve_bus(device_frontiers, budget):
+    '''
+    Choose one mode per device maximising the total quality within
+    `budget`, or return `None` if no choice fits.
+
+    Multiple-choice knapsack, solved exactly by combining the per-device
+    Pareto frontiers one device at a time.
+    '''
+    # `(bandwidth, quality, choices)`, Pareto-optimal.
+    states = [(0, 0, ())]
+    for frontier in device_frontiers:
+        combined = sorted(((bandwidth + b, quality + q, choices + (mode, ))
+                           for bandwidth, quality, choices in states
+                           for b, q, mode in frontier
+                           if bandwidth + b <= budget),
+                          key=lambda s: (s[0], -s[1]))
+        states = []
+        for state in combined:
+            if not states or state[1] > states[-1][1]:
+                states.append(state)
+        if not states:
+            return None
+    return max(states, key=lambda s: s[1])
+
+
+def allocate_modes(device_modes, sysfs_root='/sys', quality=None,
+                   budgets=None, compression_ratio=COMPRESSION_RATIO):
+    '''
+    Choose one mode for each device in `device_modes` (a dictionary mapping
+    each device to its list of modes, as returned by
+    :meth:`GstVideoSourceManager.query_device_extracted_caps`), such that
+    the devices sharing a USB bus do not exceed its bandwidth, maximising
+    the total `quality`.
+
+    `quality(video_mode)` defaults to the :class:`ModeRanker` score of the
+    mode among the modes of its device.  `budgets` optionally maps USB bus
+    names (e.g., `usb1`) to their available bandwidth in bytes per second.
+
+    Returns an :class:`Allocation`: the mode of each device, and the budget
+    and bandwidth used on each bus.  Raises `ValueError` if there is no
+    feasible allocation for some bus.
+    '''
+    ranker = ModeRanker()
+    buses = OrderedDict()
+    for device, modes in device_modes.iteritems():
+        if not modes:
+            continue
+        bus = get_usb_bus(device, sysfs_root)
+        # Devices not on a USB bus do not share bandwidth.
+        key = bus if bus is not None else (None, device)
+        buses.setdefault(key, []).append(device)
+
+    allocation = Allocation(OrderedDict(), OrderedDict())
+    for (bus, speed), devices in buses.iteritems():
+        frontiers = []
+        for device in devices:
+            modes = device_modes[device]
+            if quality is None:
+                max_pixel_rate = max(m['width'] * m['height'] * get_fps(m)
+                                     for m in modes)
+                qualities = [ranker.score(m, max_pixel_rate) for m in modes]
+            else:
+                qualities = [quality(m) for m in modes]
+            bandwidths = [estimate_bandwidth(m, compression_ratio)
+                          for m in modes]
+            frontiers.append(_pareto_modes(modes, bandwidths, qualities))
+        if bus is None:
+            # A single device, unconstrained.
+            budget = float('inf')
+        elif budgets and bus in budgets:
+            budget = budgets[bus]
+        else:
+            budget = get_bus_budget(speed)
+        solution = _solve_bus(frontiers, budget)
+        if solution is None:
+            raise ValueError, 'No feasible modes for devices %s on bus %s' % (
+                    ', '.join(map(str, devices)), bus)
+        used, total_quality, choices = solution
+        allocation.modes.update(zip(devices, choices))
+        if bus is not None:
+            allocation.usage[bus] = {'budget': budget, 'used': used,
+                                     'devices': list(devices)}
+    return allocation
@@ -0,0 +1,269 @@
+'''
+Benchmarks for probing and querying video modes, run against synthetic
+devices so that no camera is required.
+
+Run with::
+
+    python -m gst_video_source_caps_query.benchmark -o results.json
+    python -m gst_video_source_caps_query.benchmark --compare results.json
+'''
+from __future__ import division
+import cPickle as pickle
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from .backends import SyntheticBackend
+from .mode_table import ModeTable
+from .gst_video_source_caps_query import (Fps, GstVideoSourceManager,
+                                          get_available_video_modes,
+                                          write_mode_records)
+
+
+def time_call(function, repeat=3):
+    '''
+    Return the best time, in seconds, of `repeat` calls to `function`.
+    '''
+    best = None
+    for i in xrange(repeat):
+        start = time.time()
+        function()
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+
+def get_cases(device_count, caps_count):
+    '''
+    Return a list of `(name, operations, function)` benchmark cases over
+    `device_count` synthetic devices with `caps_count` caps each.
+    '''
+    backend = SyntheticBackend(device_count=device_count,
+                               caps_count=caps_count)
+    new_manager = lambda: GstVideoSourceManager(cache=False, backend=backend)
+    manager = new_manager()
+    video_modes = get_available_video_modes(manager)
+    video_caps = manager.capabilities[manager.devices[0]]
+    mode_index = manager.mode_index
+    devnull = open(os.devnull, 'w')
+
+    def validate():
+        for video_mode in video_modes:
+            GstVideoSourceManager.validate(video_mode, mode_index)
+
+    # Transfer of the mode table from a worker process, as pickled
+    # dictionaries or as an encoded `ModeTable`.
+    pickled_modes = pickle.dumps(video_modes, pickle.HIGHEST_PROTOCOL)
+    encoded_modes = ModeTable.from_video_modes(video_modes).encode()
+
+    return [('device_iter', device_count,
+             lambda: list(new_manager()._device_iter())),
+            ('get_extracted_allowed_caps', 1,
+             video_caps.get_extracted_allowed_caps),
+            ('get_extracted_allowed_caps_filtered', 1,
+             lambda: video_caps.get_extracted_allowed_caps(
+                 format_='YUY2', framerate=Fps(30, 1))),
+            ('unique_settings', 1,
+             lambda: video_caps.unique_settings(video_caps.allowed_caps)),
+            ('validate', len(video_modes), validate),
+            ('cli', len(video_modes),
+             lambda: write_mode_records(new_manager(), stream=devnull)),
+            ('pickle_modes', len(video_modes),
+             lambda: pickle.dumps(video_modes, pickle.HIGHEST_PROTOCOL)),
+            ('unpickle_modes', len(video_modes),
+             lambda: pickle.loads(pickled_modes)),
+            ('encode_mode_table', len(video_modes),
+             lambda: ModeTable.from_video_modes(video_modes).encode()),
+            ('decode_mode_table', len(video_modes),
+             lambda: ModeTable.decode(encoded_modes).to_video_modes()),
+            ('decode_mode_table_columns', len(video_modes),
+             lambda: ModeTable.decode(encoded_modes))]
+
+
+def get_transfer_sizes(device_count, caps_count):
+    '''
+    Return the size in bytes of the mode table of `device_count` synthetic
+    devices with `caps_count` caps each, pickled as dictionaries and
+    encoded as a :class:`ModeTable`.
+    '''
+    backend = SyntheticBackend(device_count=device_count,
+                               caps_count=caps_count)
+    video_modes = get_available_video_modes(
+            GstVideoSourceManager(cache=False, backend=backend))
+    return {'pickle_modes': len(pickle.dumps(video_modes,
+                                             pickle.HIGHEST_PROTOCOL)),
+            'mode_table': ModeTable.from_video_modes(video_modes).nbytes}
+
+
+# Modules timed by the import benchmarks, in a fresh interpreter each.
+# Entries may also be `from` imports, which look up submodules on the
+# (lazy) package first.
+IMPORT_MODULES = ('gst_video_source_caps_query',
+                  'gst_video_source_caps_query.formats',
+                  'gst_video_source_caps_query.cache',
+                  'gst_video_source_caps_query.ranking',
+                  'from gst_video_source_caps_query import cache',
+                  'from gst_video_source_caps_query import mode_table',
+                  'from gst_video_source_caps_query import ranking',
+                  'gst_video_source_caps_query.gst_video_source_caps_query',
+                  'gst_video_source_caps_query.elements')
+
+IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.time()
+%s
+print json.dumps({'seconds': time.time() - start,
+                  'gst': 'gst' in sys.modules})
+'''
+
+
+def get_import_statement(module_name):
+    if module_name.startswith('from '):
+        return module_name
+    return 'import %s' % module_name
+
+
+def time_import(module_name, repeat=3):
+    '''
+    Return the best time, in seconds, to import `module_name` (or run a
+    `from` import) in a fresh interpreter, and whether doing so loaded
+    GStreamer.  Returns `(None, None)` if the module cannot be imported.
+    '''
+    best = None
+    loads_gst = None
+    for i in xrange(repeat):
+        process = subprocess.Popen([sys.executable, '-c',
+                                    IMPORT_SCRIPT %
+                                    get_import_statement(module_name)],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        if process.returncode != 0:
+            return None, None
+        result = json.loads(stdout.strip().splitlines()[-1])
+        loads_gst = result['gst']
+        if best is None or result['seconds'] < best:
+            best = result['seconds']
+    return best, loads_gst
+
+
+def run_import_benchmarks(modules=IMPORT_MODULES, repeat=3):
+    results = []
+    for module_name in modules:
+        seconds, loads_gst = time_import(module_name, repeat)
+        statement = get_import_statement(module_name)
+        results.append({'benchmark': statement,
+                        'device_count': 0, 'caps_count': 0,
+                        'operations': 1, 'seconds': seconds,
+                        'seconds_per_operation': seconds,
+                        'loads_gst': loads_gst})
+        if seconds is None:
+            print '%-60s  failed' % statement
+        else:
+            print '%-60s %10.6f s%s' % (statement, seconds,
+                                        ' (loads gst)' if loads_gst else '')
+    return results
+
+
+def run_benchmarks(device_counts=(1, 4, 16), caps_counts=(100, 1000, 10000),
+                   repeat=3):
+    results = []
+    for device_count in device_counts:
+        for caps_count in caps_counts:
+            for name, operations, function in get_cases(device_count,
+                                                        caps_count):
+                seconds = time_call(function, repeat)
+                results.append({'benchmark': name,
+                                'device_count': device_count,
+                                'caps_count': caps_count,
+                                'operations': operations,
+                                'seconds': seconds,
+                                'seconds_per_operation':
+                                seconds / operations})
+                print '%-40s %4d devices %6d caps: %10.6f s' % (
+                    name, device_count, caps_count, seconds)
+            for name, size in get_transfer_sizes(device_count,
+                                                 caps_count).items():
+                results.append({'benchmark': 'bytes %s' % name,
+                                'device_count': device_count,
+                                'caps_count': caps_count, 'operations': 1,
+                                'seconds': None,
+                                'seconds_per_operation': None,
+                                'bytes': size})
+                print '%-40s %4d devices %6d caps: %10d bytes' % (
+                    'bytes %s' % name, device_count, caps_count, size)
+    return {'timestamp': time.time(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'repeat': repeat,
+            'results': results}
+
+
+def compare(results, baseline, threshold=1.2):
+    '''
+    Print the ratio of each result to the matching baseline result, and
+    return the list of results slower than `threshold` times the baseline.
+    '''
+    key = lambda r: (r['benchmark'], r['device_count'], r['caps_count'])
+    baseline_map = dict([(key(r), r) for r in baseline['results']])
+    regressions = []
+    for result in results['results']:
+        reference = baseline_map.get(key(result))
+        if (reference is None or not reference['seconds'] or
+                result['seconds'] is None):
+            continue
+        ratio = result['seconds'] / reference['seconds']
+        flag = ''
+        if ratio > threshold:
+            regressions.append(result)
+            flag = ' REGRESSION'
+        print '%-40s %4d devices %6d caps: %6.2fx%s' % (
+            result['benchmark'], result['device_count'],
+            result['caps_count'], ratio, flag)
+    return regressions
+
+
+def parse_args(args=None):
+    """Parses benchmark arguments."""
+    from argparse import ArgumentParser
+
+    parse_counts = lambda value: [int(v) for v in value.split(',')]
+    parser = ArgumentParser(description='Benchmarks video mode probing and '
+                            'queries using synthetic devices.')
+    parser.add_argument('--devices', type=parse_counts, default=[1, 4, 16],
+                        help='comma-separated device counts '
+                        '(default: %(default)s)')
+    parser.add_argument('--caps', type=parse_counts,
+                        default=[100, 1000, 10000],
+                        help='comma-separated caps counts per device '
+                        '(default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-imports', dest='imports', action='store_false',
+                        help='skip the import time benchmarks')
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('--compare', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='slowdown ratio reported as a regression '
+                        '(default: %(default)s)')
+    return parser.parse_args(args)
+
+
+def main():
+    args = parse_args()
+    results = run_benchmarks(args.devices, args.caps, args.repeat)
+    if args.imports:
+        results['results'].extend(run_import_benchmarks(repeat=args.repeat))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
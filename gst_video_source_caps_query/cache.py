@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+
+
+def get_cache_dir():
+    cache_root = os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'),
+                                             '.cache'))
+    return os.path.join(cache_root, 'gst_video_source_caps_query')
+
+
+class CapsCache(object):
+    '''
+    Persistent, JSON-backed store of probed caps records, keyed by device.
+
+    Each entry holds the identity of the device at probe time (see
+    :func:`sysfs.device_identity`) and is only returned while the identity
+    is unchanged.
+    '''
+    version = 1
+
+    def __init__(self, cache_path=None):
+        if cache_path is None:
+            cache_path = os.path.join(get_cache_dir(), 'caps.json')
+        self.cache_path = cache_path
+        self._entries = None
+        self._dirty = False
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            return {}
+        return data.get('devices', {})
+
+    def get(self, device, identity):
+        entry = self.entries.get(device)
+        if entry is None or entry['identity'] != identity:
+            return None
+        return entry['caps']
+
+    def set(self, device, identity, caps, fingerprint=None):
+        self.entries[device] = {'identity': identity, 'caps': caps,
+                                'fingerprint': fingerprint}
+        self._dirty = True
+
+    def get_fingerprint(self, device):
+        '''
+        Return the fingerprint of the caps last stored for `device`,
+        regardless of its identity, or `None`.
+        '''
+        entry = self.entries.get(device)
+        if entry is None:
+            return None
+        return entry.get('fingerprint')
+
+    def get_measurement(self, device, identity, caps_str):
+        '''
+        Return the measurement (see :func:`verify.measure_mode`) stored for
+        the mode `caps_str` of `device`, or `None`.
+        '''
+        entry = self.entries.get(device)
+        if entry is None or entry['identity'] != identity:
+            return None
+        return entry.get('measurements', {}).get(caps_str)
+
+    def set_measurement(self, device, identity, caps_str, measurement):
+        '''
+        Store a measurement of the mode `caps_str` of `device`.  Measurements
+        are dropped along with the caps when the device is probed again.
+        '''
+        entry = self.entries.get(device)
+        if entry is None or entry['identity'] != identity:
+            entry = self.entries[device] = {'identity': identity,
+                                            'caps': None}
+        entry.setdefault('measurements', {})[caps_str] = measurement
+        self._dirty = True
+
+    def prune(self, devices):
+        '''
+        Drop the entries of devices that are no longer present.
+        '''
+        for device in set(self.entries) - set(devices):
+            del self.entries[device]
+            self._dirty = True
+
+    def clear(self):
+        self._entries = {}
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        temp_path = self.cache_path + '.tmp'
+        try:
+            if cache_dir and not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(temp_path, 'w') as f:
+                json.dump({'version': self.version, 'devices': self.entries},
+                          f)
+            os.rename(temp_path, self.cache_path)
+        except (IOError, OSError):
+            logging.warning('error writing caps cache %s' % self.cache_path)
+            return
+        self._dirty = False
@@ -0,0 +1,89 @@
+from collections import defaultdict
+
+from .ranges import ModeSpace
+
+
+class CapsRecord(object):
+    '''
+    Caps structure decoded once into plain values.
+
+    `width`, `height` and `framerates` are the discrete values used for
+    indexing (the upper bound of a dimension range and the endpoints of a
+    frame rate range).  `space` is the :class:`ModeSpace` holding the full
+    ranges, and `raw` the original structure dictionary.
+    '''
+    __slots__ = ('name', 'width', 'height', 'fourcc', 'framerates', 'raw',
+                 'space')
+
+    def __init__(self, name, width, height, fourcc, framerates, raw=None,
+                 space=None):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.fourcc = fourcc
+        self.framerates = tuple(framerates)
+        self.raw = raw
+        if space is None:
+            space = ModeSpace((width, ), (height, ), self.framerates)
+        self.space = space
+
+    @property
+    def dimensions(self):
+        return self.width, self.height
+
+    def __repr__(self):
+        return ('CapsRecord(name=%r, width=%r, height=%r, fourcc=%r, '
+                'framerates=%r)' % (self.name, self.width, self.height,
+                                    self.fourcc, self.framerates))
+
+
+class CapsIndex(object):
+    '''
+    Per-field indexes over a list of :class:`CapsRecord` instances.
+
+    Combined filters are answered by intersecting the sets of record
+    positions matching each field.
+    '''
+    def __init__(self, records):
+        self.records = list(records)
+        self._by_name = defaultdict(set)
+        self._by_dimensions = defaultdict(set)
+        self._by_fourcc = defaultdict(set)
+        self._by_framerate = defaultdict(set)
+        for i, record in enumerate(self.records):
+            self._by_name[record.name].add(i)
+            self._by_dimensions[record.dimensions].add(i)
+            self._by_fourcc[record.fourcc].add(i)
+            for fps in record.framerates:
+                self._by_framerate[fps].add(i)
+
+    def select(self, dimensions=None, framerate=None, format_=None,
+               name=None):
+        '''
+        Return the records matching all of the specified fields, in their
+        original order.
+        '''
+        positions = None
+        for index, key in ((self._by_dimensions, dimensions),
+                           (self._by_framerate, framerate),
+                           (self._by_fourcc, format_),
+                           (self._by_name, name)):
+            if not key:
+                continue
+            matches = index.get(key, set())
+            positions = matches if positions is None else positions & matches
+            if not positions:
+                return []
+        if positions is None:
+            return self.records[:]
+        return [self.records[i] for i in sorted(positions)]
+
+    def unique_settings(self):
+        info = {}
+        for k, index in (('framerates', self._by_framerate),
+                         ('dimensions', self._by_dimensions),
+                         ('formats', self._by_fourcc),
+                         ('names', self._by_name)):
+            if index:
+                info[k] = tuple(sorted(index))
+        return info
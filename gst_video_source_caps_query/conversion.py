@@ -0,0 +1,130 @@
+from __future__ import division
+from collections import namedtuple
+
+from .formats import Fps, get_caps_string, is_compressed
+
+
+# Relative CPU cost per pixel of each conversion step.
+STEP_COSTS = {'rate': 0., 'decode': 10., 'scale': 4., 'colorspace': 2.}
+# Element implementing each conversion step, in pipeline order (the decode
+# element depends on the source format; see `DECODERS`).
+STEP_ELEMENTS = (('rate', 'videorate'), ('decode', None),
+                 ('scale', 'videoscale'), ('colorspace', 'ffmpegcolorspace'))
+# Decoder element of each compressed format.  Modes in other compressed
+# formats (e.g., H264) are only used without decoding.
+DECODERS = {'MJPG': 'jpegdec', 'JPEG': 'jpegdec'}
+# Formats scaled without a colorspace conversion.
+SCALABLE_FOURCCS = ('YUY2', 'UYVY', 'I420', 'YV12', 'RGB3', 'BGR3', 'RGB4',
+                    'BGR4', 'GREY')
+# Format of decoded compressed frames.
+DECODED_FOURCC = 'I420'
+
+# `steps` are the conversion steps (see `STEP_COSTS`) from `video_mode` to
+# the output, and `cost` their estimated CPU cost in Mpixel operations per
+# second.
+ConversionPlan = namedtuple('ConversionPlan', 'video_mode steps cost '
+                            'output_caps')
+
+
+def get_fps(framerate):
+    num, denom = framerate
+    return num / denom
+
+
+def get_stream_name(fourcc):
+    if fourcc in ('RGB3', 'BGR3', 'RGB4', 'BGR4', 'RGBP'):
+        return 'video/x-raw-rgb'
+    if fourcc == 'GREY':
+        return 'video/x-raw-gray'
+    return 'video/x-raw-yuv'
+
+
+def plan_conversion(video_mode, width, height, fourcc=None, framerate=None):
+    '''
+    Return the :class:`ConversionPlan` producing `width`x`height` frames in
+    `fourcc` (by default, any raw format) at `framerate` (by default, that
+    of `video_mode`) from `video_mode`, or `None` if `video_mode` cannot
+    satisfy the request (e.g., its frame rate is too low, or its format
+    cannot be decoded).
+    '''
+    source_fps = get_fps(video_mode['framerate'])
+    if framerate is None:
+        framerate = video_mode['framerate']
+    output_fps = get_fps(framerate)
+    if source_fps < output_fps:
+        # Duplicating frames would not deliver the requested rate.
+        return None
+    steps = []
+    cost = 0.
+    pixel_rate = video_mode['width'] * video_mode['height'] * output_fps / 1e6
+    current_fourcc = video_mode['fourcc']
+    if source_fps > output_fps:
+        steps.append('rate')
+    if is_compressed(current_fourcc) and current_fourcc != fourcc:
+        if current_fourcc not in DECODERS:
+            return None
+        steps.append('decode')
+        cost += STEP_COSTS['decode'] * pixel_rate
+        current_fourcc = DECODED_FOURCC
+    if (video_mode['width'], video_mode['height']) != (width, height):
+        if current_fourcc not in SCALABLE_FOURCCS:
+            steps.append('colorspace')
+            cost += STEP_COSTS['colorspace'] * pixel_rate
+            current_fourcc = DECODED_FOURCC
+        steps.append('scale')
+        # Scaling costs in proportion to the larger of the two sizes.
+        cost += STEP_COSTS['scale'] * max(pixel_rate, width * height *
+                                          output_fps / 1e6)
+    if fourcc is not None and current_fourcc != fourcc:
+        if is_compressed(fourcc):
+            # Encoding is left to the consumer.
+            return None
+        if 'colorspace' not in steps:
+            steps.append('colorspace')
+        cost += STEP_COSTS['colorspace'] * width * height * output_fps / 1e6
+        current_fourcc = fourcc
+    output_caps = get_caps_string({'name': get_stream_name(current_fourcc),
+                                   'width': width, 'height': height,
+                                   'fourcc': current_fourcc,
+                                   'framerate': Fps(*framerate)})
+    # Order the steps as in the pipeline.
+    steps = [step for step, element in STEP_ELEMENTS if step in steps]
+    return ConversionPlan(video_mode, tuple(steps), cost, output_caps)
+
+
+def plan_conversions(video_modes, width, height, fourcc=None, framerate=None):
+    '''
+    Return the plans producing the requested output from each of
+    `video_modes` able to, cheapest first.
+
+    Ties are broken in favour of fewer steps, then of the source modes
+    whose format can be scaled without conversion.
+    '''
+    plans = [plan_conversion(video_mode, width, height, fourcc, framerate)
+             for video_mode in video_modes]
+    return sorted([plan for plan in plans if plan is not None],
+                  key=lambda p: (p.cost, len(p.steps),
+                                 p.video_mode['fourcc'] not in
+                                 SCALABLE_FOURCCS))
+
+
+def get_output_caps_string(output):
+    '''
+    Return a caps string describing the frames of the requested `output`
+    (see :func:`plan_conversion`), for sizing frame buffers.
+    '''
+    fourcc = output.get('fourcc')
+    caps_str = '%s,width=%d,height=%d' % (get_stream_name(fourcc),
+                                          output['width'], output['height'])
+    if fourcc is not None:
+        caps_str += ',fourcc=%s' % fourcc
+    return caps_str
+
+
+def get_conversion_elements(plan):
+    '''
+    Return the factory names of the elements implementing `plan`.
+    '''
+    return [DECODERS[plan.video_mode['fourcc']] if step == 'decode'
+            else element for step, element in STEP_ELEMENTS
+            if step in plan.steps]
@@ -0,0 +1,305 @@
+'''
+GStreamer elements used to probe devices and to build capture pipelines.
+
+Importing this module loads GStreamer; the rest of the package (e.g.,
+:class:`GstVideoSourceManager` with a synthetic backend) does not.
+'''
+import os
+import traceback
+
+try:
+    import pygst
+    pygst.require("0.10")
+except:
+    pass
+finally:
+    import gst
+import gobject
+
+from .conversion import get_conversion_elements
+
+
+class ProbeError(Exception):
+    pass
+
+
+class CapsProbe(object):
+    '''
+    Long-lived pipeline used to query the caps of video sources.
+
+    The source is linked to a `fakesink` and only the source itself is set
+    to READY, so no display sink is ever loaded.  Source elements are
+    swapped in and out of the pipeline as needed, and :meth:`get_source`
+    reuses a single element per factory, so probing a device costs little
+    more than opening it.  Not thread-safe.
+    '''
+    def __init__(self):
+        self.pipeline = gst.Pipeline('caps_probe')
+        self.sink = gst.element_factory_make('fakesink', 'caps_probe_sink')
+        self.pipeline.add(self.sink)
+        self._sources = {}
+        self._source = None
+
+    def get_source(self, factory_name, device_key=None, video_device=None):
+        '''
+        Return the reusable source element for `factory_name`, configured
+        for `video_device`.
+        '''
+        video_source = self._sources.get(factory_name)
+        if video_source is None:
+            video_source = gst.element_factory_make(
+                    factory_name, 'caps_probe_%s' % factory_name)
+            self._sources[factory_name] = video_source
+        if device_key is not None:
+            video_source.set_property(device_key, video_device)
+        return video_source
+
+    def _swap_source(self, video_source):
+        if self._source is not None:
+            self._source.unlink(self.sink)
+            self.pipeline.remove(self._source)
+            self._source = None
+        self.pipeline.add(video_source)
+        try:
+            video_source.link(self.sink)
+        except gst.LinkError:
+            self.pipeline.remove(video_source)
+            raise
+        self._source = video_source
+
+    def query(self, video_source):
+        '''
+        Return the allowed caps of `video_source`, as a list of dictionaries.
+
+        Raises :class:`ProbeError` if the device cannot be opened (e.g.,
+        unplugged, or no permission), rather than returning the template
+        caps of the source.
+        '''
+        if video_source is not self._source:
+            self._swap_source(video_source)
+        try:
+            if (video_source.set_state(gst.STATE_READY) ==
+                    gst.STATE_CHANGE_FAILURE):
+                raise ProbeError, 'Unable to open %s' % video_source.get_name()
+            caps = video_source.get_pad('src').get_allowed_caps()
+        finally:
+            video_source.set_state(gst.STATE_NULL)
+        return [dict([(k, c[k]) for k in c.keys()] + [('name', c.get_name())])
+                for c in caps]
+
+
+_caps_probe = None
+_caps_probe_pid = None
+
+
+def get_caps_probe():
+    '''
+    Return the :class:`CapsProbe` shared within the current process.
+    '''
+    global _caps_probe, _caps_probe_pid
+
+    # Do not reuse a probe pipeline inherited from a parent process.
+    if _caps_probe is None or _caps_probe_pid != os.getpid():
+        _caps_probe = CapsProbe()
+        _caps_probe_pid = os.getpid()
+    return _caps_probe
+
+
+# Value of the `leaky` property of the delivery queue for each policy.
+DELIVERY_POLICIES = {'block': 0, 'drop-newest': 1, 'drop-oldest': 2,
+                     'keep-latest': 2}
+
+
+def get_delivery_queue(policy, depth=1, name='delivery_queue'):
+    '''
+    Return a `queue` holding at most `depth` frames, which drops frames
+    (or blocks the source) according to `policy` when full:
+
+     - `block`: block the source until a frame is consumed.
+     - `drop-newest`: drop incoming frames.
+     - `drop-oldest`: drop the oldest queued frame.
+     - `keep-latest`: keep only the latest frame (i.e., `depth` is 1).
+    '''
+    if policy not in DELIVERY_POLICIES:
+        raise ValueError, 'Unknown delivery policy: %s' % policy
+    if policy == 'keep-latest':
+        depth = 1
+    queue = gst.element_factory_make('queue', name)
+    queue.set_property('leaky', DELIVERY_POLICIES[policy])
+    queue.set_property('max-size-buffers', depth)
+    # Bound the queue by frame count only.
+    queue.set_property('max-size-bytes', 0)
+    queue.set_property('max-size-time', 0)
+    return queue
+
+
+class FilteredInput(gst.Bin):
+    '''
+    Video source, filtered to `caps_str`.
+
+    If `delivery_policy` is set (see :func:`get_delivery_queue`), frames are
+    delivered through a queue of at most `depth` frames, so that a slow
+    consumer neither stalls the source nor accumulates latency.
+
+    If `conversion_plan` is set (see :func:`conversion.plan_conversion`),
+    frames are converted by the elements of the plan to its output caps.
+    '''
+    def __init__(self, name, caps_str, video_src, delivery_policy=None,
+                 depth=1, conversion_plan=None):
+        super(FilteredInput, self).__init__(name)
+
+        try:
+            caps = gst.Caps(caps_str)
+        except (Exception, ), why:
+            traceback.print_exc()
+            print 'name: {}, caps_str: "{}"'.format(name, caps_str)
+            raise
+        caps_filter = gst.element_factory_make('capsfilter', 'caps_filter')
+        caps_filter.set_property('caps', caps)
+        self.caps_filter = caps_filter
+
+        self.add(video_src, caps_filter)
+        video_src.link(caps_filter)
+        src_element = caps_filter
+
+        self.conversion_plan = conversion_plan
+        if conversion_plan is not None:
+            for factory_name in get_conversion_elements(conversion_plan):
+                element = gst.element_factory_make(factory_name)
+                self.add(element)
+                src_element.link(element)
+                src_element = element
+            output_caps_filter = gst.element_factory_make(
+                    'capsfilter', 'output_caps_filter')
+            output_caps_filter.set_property(
+                    'caps', gst.Caps(conversion_plan.output_caps))
+            self.add(output_caps_filter)
+            src_element.link(output_caps_filter)
+            src_element = output_caps_filter
+
+        self.delivery_policy = delivery_policy
+        self.delivery_queue = None
+        self.received_count = 0
+        self.delivered_count = 0
+        if delivery_policy is not None:
+            self.delivery_queue = get_delivery_queue(delivery_policy, depth)
+            self.add(self.delivery_queue)
+            src_element.link(self.delivery_queue)
+            # Each counter is only updated from a single streaming thread.
+            self.delivery_queue.get_pad('sink').add_buffer_probe(
+                    self._on_received)
+            self.delivery_queue.get_pad('src').add_buffer_probe(
+                    self._on_delivered)
+            src_element = self.delivery_queue
+
+        src_gp = gst.GhostPad("src", src_element.get_pad('src'))
+        self.add_pad(src_gp)
+
+    def _on_received(self, pad, buffer_):
+        self.received_count += 1
+        return True
+
+    def _on_delivered(self, pad, buffer_):
+        self.delivered_count += 1
+        return True
+
+    def get_delivery_stats(self):
+        '''
+        Return the delivery policy, queue depth and the number of frames
+        delivered, dropped and currently queued, or `None` if frames are
+        delivered without a queue.
+        '''
+        if self.delivery_queue is None:
+            return None
+        queued = self.delivery_queue.get_property('current-level-buffers')
+        return {'policy': self.delivery_policy,
+                'depth': self.delivery_queue.get_property('max-size-buffers'),
+                'delivered': self.delivered_count,
+                'dropped': max(0, self.received_count - self.delivered_count -
+                               queued),
+                'queued': queued}
+
+
+class FanOut(object):
+    '''
+    Feed the frames of a single `video_source` (e.g., a
+    :class:`FilteredInput`) in `pipeline` to any number of named branches,
+    each a queue and a sink, through a `tee`.
+
+    Branches may be attached and detached while the pipeline is playing,
+    without renegotiating caps or restarting the source, so one device can
+    serve, e.g., a preview, a recording and an analysis at once.
+
+    Each branch queue drops frames according to its delivery policy (see
+    :func:`get_delivery_queue`), so a slow branch does not stall the others
+    unless its policy is `block`.
+    '''
+    def __init__(self, pipeline, video_source, name='fan_out'):
+        self.pipeline = pipeline
+        self.name = name
+        self.tee = gst.element_factory_make('tee', '%s_tee' % name)
+        # Keep frames flowing (and the source running) while no branch is
+        # attached.
+        self.idle_queue = get_delivery_queue('keep-latest',
+                                             name='%s_idle_queue' % name)
+        idle_sink = gst.element_factory_make('fakesink', '%s_idle_sink' %
+                                             name)
+        idle_sink.set_property('sync', False)
+        idle_sink.set_property('async', False)
+        pipeline.add(video_source, self.tee, self.idle_queue, idle_sink)
+        video_source.link(self.tee)
+        self.tee.link(self.idle_queue)
+        self.idle_queue.link(idle_sink)
+        # `(tee pad, queue, sink)` by branch name.
+        self.branches = {}
+
+    def attach(self, branch, video_sink, delivery_policy='drop-oldest',
+               depth=4):
+        '''
+        Attach `video_sink` as a new branch named `branch`.
+        '''
+        if branch in self.branches:
+            raise ValueError, 'Branch %s already attached' % branch
+        queue = get_delivery_queue(delivery_policy, depth,
+                                   name='%s_%s_queue' % (self.name, branch))
+        self.pipeline.add(queue, video_sink)
+        queue.link(video_sink)
+        tee_pad = self.tee.get_request_pad('src%d')
+        tee_pad.link(queue.get_pad('sink'))
+        self.branches[branch] = tee_pad, queue, video_sink
+        # Bring the branch to the state of the (possibly playing) pipeline.
+        video_sink.sync_state_with_parent()
+        queue.sync_state_with_parent()
+        return queue, video_sink
+
+    def detach(self, branch):
+        '''
+        Detach branch `branch`.
+
+        While the pipeline is playing, the branch is removed once its `tee`
+        pad has been blocked between two frames, from the main loop.
+        '''
+        if branch not in self.branches:
+            raise KeyError, 'No branch %s' % branch
+        tee_pad, queue, video_sink = self.branches[branch]
+        result, state, pending = self.pipeline.get_state(0)
+        if state == gst.STATE_PLAYING:
+            tee_pad.set_blocked_async(True, self._on_branch_blocked, branch)
+        else:
+            self._remove_branch(branch)
+
+    def _on_branch_blocked(self, tee_pad, blocked, branch):
+        if blocked:
+            # Called from the streaming thread; remove from the main loop.
+            gobject.idle_add(self._remove_branch, branch)
+
+    def _remove_branch(self, branch):
+        tee_pad, queue, video_sink = self.branches.pop(branch)
+        tee_pad.unlink(queue.get_pad('sink'))
+        if tee_pad.is_blocked():
+            tee_pad.set_blocked_async(False, lambda *args: None)
+        self.tee.release_request_pad(tee_pad)
+        for element in (queue, video_sink):
+            element.set_state(gst.STATE_NULL)
+            self.pipeline.remove(element)
+        return False
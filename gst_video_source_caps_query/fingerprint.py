@@ -0,0 +1,75 @@
+from collections import namedtuple
+from fractions import Fraction
+import hashlib
+import json
+
+
+# Immutable, canonical form of a single mode.  `framerate` is a reduced
+# `(num, denom)` tuple, and `ranges` the advertised ranges of the caps
+# structure (see :meth:`ModeSpace.range_fields`) as a JSON string, or
+# `None`.
+ModeRecord = namedtuple('ModeRecord', 'name width height fourcc framerate '
+                        'ranges')
+
+
+class ModeDiff(namedtuple('ModeDiff', 'added removed')):
+    __slots__ = ()
+
+    def __nonzero__(self):
+        return bool(self.added or self.removed)
+
+
+def canonical_modes(records):
+    '''
+    Return a sorted tuple of unique :class:`ModeRecord`, one per frame rate
+    of each caps record (see
+    :meth:`GstVideoSourceCapabilities.to_records`).
+    '''
+    modes = set()
+    for r in records:
+        ranges = r.get('ranges')
+        if ranges is not None:
+            ranges = json.dumps(ranges, sort_keys=True)
+        for num, denom in r['framerates']:
+            framerate = Fraction(int(num), int(denom))
+            modes.add(ModeRecord(r['name'], int(r['width']),
+                                 int(r['height']), r['fourcc'],
+                                 (framerate.numerator,
+                                  framerate.denominator), ranges))
+    return tuple(sorted(modes))
+
+
+def fingerprint(modes):
+    '''
+    Return a stable content hash of canonical `modes`.
+    '''
+    data = json.dumps([list(mode) for mode in modes], separators=(',', ':'))
+    return hashlib.sha1(data).hexdigest()
+
+
+def diff_modes(old_modes, new_modes):
+    '''
+    Return a :class:`ModeDiff` of the modes added and removed between two
+    probes of a device.
+    '''
+    old_modes, new_modes = set(old_modes), set(new_modes)
+    return ModeDiff(tuple(sorted(new_modes - old_modes)),
+                    tuple(sorted(old_modes - new_modes)))
+
+
+def diff_devices(old_device_modes, new_device_modes):
+    '''
+    Return a dictionary mapping each device whose modes differ between
+    `old_device_modes` and `new_device_modes` (each mapping devices to
+    canonical modes) to its :class:`ModeDiff`.
+
+    Devices are compared by fingerprint; modes are only compared for the
+    devices that changed.
+    '''
+    diffs = {}
+    for device in set(old_device_modes) | set(new_device_modes):
+        old_modes = old_device_modes.get(device, ())
+        new_modes = new_device_modes.get(device, ())
+        if fingerprint(old_modes) != fingerprint(new_modes):
+            diffs[device] = diff_modes(old_modes, new_modes)
+    return diffs
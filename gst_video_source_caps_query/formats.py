@@ -0,0 +1,67 @@
+from __future__ import division
+from collections import namedtuple
+
+
+Fps = namedtuple('Fps', 'num denom')
+
+# Bits per pixel of raw (uncompressed) formats, by fourcc.
+FOURCC_BITS_PER_PIXEL = {'YUY2': 16, 'YUYV': 16, 'YVYU': 16, 'UYVY': 16,
+                         'I420': 12, 'YV12': 12, 'NV12': 12, 'NV21': 12,
+                         'GREY': 8, 'Y800': 8, 'RGBP': 16, 'RGB3': 24,
+                         'BGR3': 24, 'RGB4': 32, 'BGR4': 32}
+COMPRESSED_FOURCCS = ('MJPG', 'JPEG', 'H264')
+
+
+def is_compressed(fourcc):
+    return fourcc in COMPRESSED_FOURCCS
+
+
+def get_frame_size(width, height, fourcc):
+    '''
+    Return the size in bytes of a frame, or an upper bound (that of a
+    16 bits per pixel raw frame) for compressed formats.
+    '''
+    bits_per_pixel = FOURCC_BITS_PER_PIXEL.get(fourcc, 16)
+    return width * height * bits_per_pixel // 8
+
+
+def get_frame_shape(width, height, fourcc):
+    '''
+    Return the array shape of a frame, or `None` for compressed or unknown
+    formats.
+    '''
+    bits_per_pixel = FOURCC_BITS_PER_PIXEL.get(fourcc)
+    if bits_per_pixel is None:
+        return None
+    if bits_per_pixel == 12:
+        # Planar 4:2:0; chroma planes follow the luma plane.
+        return height * 3 // 2, width
+    if bits_per_pixel == 8:
+        return height, width
+    return height, width, bits_per_pixel // 8
+
+
+def get_caps_string(extracted_cap):
+    return '{name:s},width={width:d},height={height:d},fourcc={fourcc:s},'\
+            'framerate={framerate.num:d}/{framerate.denom:d}'.format(**extracted_cap)
+
+
+def format_cap(c):
+    return '[{width:4d} {height:4d} {fps:2.0f}fps '\
+        '({fourcc:s})]'.format(fps=c['framerate'].num / c['framerate'].denom, **c)
+
+
+def parse_caps_string(caps_str):
+    '''
+    Parse a caps string as returned by :func:`get_caps_string`.
+    '''
+    fields = caps_str.split(',')
+    caps = {'name': fields[0]}
+    for field in fields[1:]:
+        key, value = field.split('=', 1)
+        if key in ('width', 'height'):
+            value = int(value)
+        elif key == 'framerate':
+            value = tuple(int(v) for v in value.split('/'))
+        caps[key] = value
+    return caps
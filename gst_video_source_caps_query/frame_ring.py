@@ -0,0 +1,171 @@
+from collections import namedtuple
+import mmap
+import os
+import struct
+import tempfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .formats import get_frame_shape, get_frame_size, parse_caps_string
+
+
+Frame = namedtuple('Frame', 'slot sequence timestamp data')
+
+# Per-slot header: sequence number and payload size.
+SLOT_HEADER = struct.Struct('<QQ')
+# Sequence number of a slot being written (sequences start at 1).
+WRITING = 0
+
+
+def get_shared_memory_dir():
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class FrameRing(object):
+    '''
+    Ring of fixed-size frame slots in a memory-mapped file, shared between
+    a writer process and a reader process.
+
+    Each slot starts with a header holding the sequence number and size of
+    the frame written to it.  The header works as a seqlock: it is set to
+    `WRITING` while the frame is copied, so a reader that checks the
+    sequence number after using a frame knows whether it was overwritten
+    meanwhile.
+    '''
+    def __init__(self, path, slot_size, slot_count, create=False):
+        self.path = path
+        self.slot_size = slot_size
+        self.slot_count = slot_count
+        self.slot_stride = SLOT_HEADER.size + slot_size
+        if create:
+            with open(path, 'wb') as f:
+                f.truncate(self.slot_stride * slot_count)
+        self._file = open(path, 'r+b')
+        self.buffer = mmap.mmap(self._file.fileno(),
+                                self.slot_stride * slot_count)
+        self._sequence = 0
+
+    @classmethod
+    def create(cls, slot_size, slot_count):
+        '''
+        Create a ring in a new file under the shared memory directory.
+        '''
+        fd, path = tempfile.mkstemp(prefix='gst_frames_',
+                                    dir=get_shared_memory_dir())
+        os.close(fd)
+        return cls(path, slot_size, slot_count, create=True)
+
+    def write(self, data, slot=None):
+        '''
+        Copy `data` into `slot` (by default, the slot after the last one
+        written) and return `(slot, sequence)`.
+        '''
+        if len(data) > self.slot_size:
+            raise ValueError, 'Frame of %d bytes exceeds slot size of %d' % (
+                    len(data), self.slot_size)
+        self._sequence += 1
+        if slot is None:
+            slot = (self._sequence - 1) % self.slot_count
+        offset = slot * self.slot_stride
+        # Invalidate the frame in the slot before overwriting it, and write
+        # the header last, so that a reader never sees a sequence number
+        # for a partially written frame.
+        self.buffer[offset:offset + SLOT_HEADER.size] = SLOT_HEADER.pack(
+                WRITING, 0)
+        self.buffer[offset + SLOT_HEADER.size:
+                    offset + SLOT_HEADER.size + len(data)] = data
+        self.buffer[offset:offset + SLOT_HEADER.size] = SLOT_HEADER.pack(
+                self._sequence, len(data))
+        return slot, self._sequence
+
+    def read_header(self, slot):
+        '''
+        Return `(sequence, size)` of the frame in `slot`.
+        '''
+        offset = slot * self.slot_stride
+        return SLOT_HEADER.unpack(self.buffer[offset:
+                                              offset + SLOT_HEADER.size])
+
+    def get_view(self, slot, size, shape=None):
+        '''
+        Return a view of the frame in `slot`, without copying.
+
+        A NumPy array (with `shape`, if given) is returned when NumPy is
+        available, and a `buffer` object otherwise.
+        '''
+        offset = slot * self.slot_stride + SLOT_HEADER.size
+        if np is None:
+            return buffer(self.buffer, offset, size)
+        view = np.frombuffer(self.buffer, dtype=np.uint8, count=size,
+                             offset=offset)
+        if shape is not None:
+            view = view.reshape(shape)
+        return view
+
+    def unlink(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        '''
+        Unmap the ring.  Any outstanding view becomes invalid.
+        '''
+        self.buffer.close()
+        self._file.close()
+
+
+class FrameExport(object):
+    '''
+    Reader side of the frames exported by a GStreamer worker pipeline.
+
+    Frames are delivered as zero-copy views into the shared ring; a view is
+    only valid until the worker wraps around and overwrites its slot.  Check
+    with :meth:`is_current` *after* using (e.g., copying) a frame, and
+    discard the result if the frame is no longer current.
+    '''
+    def __init__(self, caps_str, slot_count=4, callback=None):
+        caps = parse_caps_string(caps_str)
+        self.width = caps['width']
+        self.height = caps['height']
+        self.fourcc = caps.get('fourcc')
+        self.shape = get_frame_shape(self.width, self.height, self.fourcc)
+        self.ring = FrameRing.create(get_frame_size(self.width, self.height,
+                                                    self.fourcc), slot_count)
+        self.callback = callback
+        self.latest = None
+
+    @property
+    def config(self):
+        '''
+        Parameters needed by the worker to open the ring.
+        '''
+        return {'path': self.ring.path, 'slot_size': self.ring.slot_size,
+                'slot_count': self.ring.slot_count}
+
+    def on_frame(self, event):
+        if self.ring.read_header(event['slot'])[0] != event['sequence']:
+            # Already being overwritten.
+            return
+        shape = self.shape if event['size'] == self.ring.slot_size else None
+        frame = Frame(event['slot'], event['sequence'], event['timestamp'],
+                      self.ring.get_view(event['slot'], event['size'], shape))
+        self.latest = frame
+        if self.callback is not None:
+            self.callback(frame)
+
+    def is_current(self, frame):
+        '''
+        Return `True` if the slot of `frame` has not been overwritten, nor
+        is being overwritten, since `frame` was written.
+        '''
+        return self.ring.read_header(frame.slot)[0] == frame.sequence
+
+    def close(self):
+        # Views handed out may outlive the export, so leave the mapping to
+        # be released once they are garbage collected.
+        self.ring.unlink()
@@ -1,22 +1,22 @@
 from __future__ import division
-from collections import namedtuple
+import json
 import logging
 import platform
 from pprint import pprint
-from multiprocessing import Process, Pipe
-import traceback
+from multiprocessing import Process, Pipe, Pool
+import sys
+import threading
+import time
 
 from path import path
-try:
-    import pygst
-    pygst.require("0.10")
-except:
-    pass
-finally:
-    import gst
-
 
-Fps = namedtuple('Fps', 'num denom')
+from .backends import GstDeviceBackend
+from .cache import CapsCache
+from .caps_index import CapsIndex, CapsRecord
+from .fingerprint import canonical_modes, diff_devices, fingerprint
+from .formats import Fps, format_cap, get_caps_string
+from .mode_index import ModeIndex
+from .ranges import FractionRange, IntRange, ModeSpace
 
 
 def test(**kw):
@@ -27,12 +27,24 @@ class DeviceNotFound(Exception):
     pass
 
 
-def get_available_video_modes(**kwargs):
-    video_source_manager = GstVideoSourceManager()
+def get_available_video_modes(video_source_manager=None, **kwargs):
+    '''
+    Pass a long-lived `video_source_manager` to reuse the capabilities it
+    has already probed.
+
+    Modes measured by :func:`verify.verify_device_modes` are annotated with
+    the cached measurements under the `measured` key (see
+    :class:`ModeRanker`, `use_measured`).
+    '''
+    if video_source_manager is None:
+        video_source_manager = GstVideoSourceManager()
     caps = video_source_manager.query_device_extracted_caps(**kwargs)
     video_modes = []
     for device, caps in caps.items():
         for c in caps:
+            measurement = video_source_manager.get_measurement(device, c)
+            if measurement is not None:
+                c['measured'] = measurement
             c['device'] = device
             video_modes.append(c)
     if not video_modes:
@@ -40,12 +52,12 @@ def get_available_video_modes(**kwargs):
     return video_modes
 
 
-def get_video_source_configs():
+def get_video_source_configs(by_id_dir='/dev/v4l/by-id'):
     logging.basicConfig(format='%(message)s', level=logging.INFO)
 
     if platform.system() == 'Linux':
         try:
-            devices = path('/dev/v4l/by-id').listdir()
+            devices = path(by_id_dir).listdir()
         except OSError:
             raise DeviceNotFound, 'No devices available'
         device_key = 'device'
@@ -61,58 +73,308 @@ def get_video_source_configs():
     return device_key, devices
 
 
+def is_ignored_device(video_device):
+    return 'ASUS Virtual' in video_device
+
+
+def probe_device_records(backend, video_device):
+    '''
+    Probe a single device through `backend` and return `(records,
+    probe_duration)`, or `None` if the device could not be queried.
+
+    Module-level so that it may be run in a worker process.
+    '''
+    video_caps = backend.probe(video_device)
+    if video_caps is None:
+        return None
+    return video_caps.to_records(), video_caps.probe_duration
+
+
+def is_gst_value(value, type_name):
+    '''
+    Return `True` if `value` is an instance of `gst.<type_name>` (e.g.,
+    `IntRange`).  Values decoded without GStreamer never are, so this does
+    not load it.
+    '''
+    gst = sys.modules.get('gst')
+    return gst is not None and isinstance(value, getattr(gst, type_name))
+
+
+def get_video_source_factory():
+    if platform.system() == 'Linux':
+        return 'v4l2src'
+    return 'dshowvideosrc'
+
+
 class GstVideoSourceManager(object):
-    def __init__(self, video_source=None):
-        self.device_key, self.devices = get_video_source_configs()
+    def __init__(self, video_source=None, cache=True, processes=None,
+                 probe_timeout=10., by_id_dir='/dev/v4l/by-id', backend=None):
+        '''
+        Set `cache` to `False` to always probe devices, or to a
+        :class:`CapsCache` instance to use a cache file other than the
+        default one in the user cache directory.
+
+        Set `processes` to probe devices concurrently in a pool of that many
+        worker processes, skipping any device that takes longer than
+        `probe_timeout` seconds.
+
+        Probed capabilities are kept in memory, so a long-lived manager
+        only probes new or changed devices; see :meth:`update_devices` and
+        :class:`hotplug.DeviceWatcher`.
+
+        Devices are listed and probed through `backend` (see
+        :mod:`backends`), by default the hardware devices in `by_id_dir`.
+        '''
+        if backend is None:
+            backend = GstDeviceBackend(by_id_dir)
+        self.backend = backend
+        self.devices = backend.list_devices()
+        self.device_key = backend.device_key
+        if cache is True:
+            cache = CapsCache()
+        self.cache = cache or None
+        self.processes = processes
+        self.probe_timeout = probe_timeout
+        self.capabilities = {}
+        self.identities = {}
+        # Called as `callback(added, removed, changed)` by `update_devices`.
+        self.device_change_callbacks = []
+        # Serialises probing (through the process-global `CapsProbe`) and
+        # updates of the probed state, between e.g. a `DeviceWatcher` thread
+        # and the thread querying the manager.  Re-entrant, since
+        # `update_devices` probes through `_device_iter`.
+        self._update_lock = threading.RLock()
+        self._mode_index = None
 
     @staticmethod
     def get_video_source():
-        if platform.system() == 'Linux':
-            video_source = gst.element_factory_make('v4l2src', 'video_source')
-        else:
-            video_source = gst.element_factory_make('dshowvideosrc', 'video_source')
-        return video_source
+        from .elements import gst
 
-    def _device_iter(self):
-        for video_device in self.devices:
-            if 'ASUS Virtual' in video_device:
-                continue
-            video_source = self.get_video_source()
-            video_source.set_property(self.device_key, video_device)
+        return gst.element_factory_make(get_video_source_factory(),
+                                        'video_source')
+
+    @property
+    def by_id_dir(self):
+        return self.backend.by_id_dir
+
+    def get_device_identity(self, video_device):
+        return self.backend.get_identity(video_device)
+
+    def get_measurement(self, video_device, video_mode):
+        '''
+        Return the measurement cached for `video_mode` of `video_device` (see
+        :func:`verify.verify_device_modes`), or `None`.
+        '''
+        if self.cache is None:
+            return None
+        with self._update_lock:
+            return self.cache.get_measurement(
+                    video_device, self.identities.get(video_device),
+                    get_caps_string(video_mode))
+
+    def _device_iter(self, refresh=False):
+        '''
+        Yield `(video_device, video_caps)` for each device.
+
+        Capabilities already probed by this manager are reused, as are caps
+        from the cache when the device identity is unchanged, unless
+        `refresh` is `True`.  Remaining devices are probed, in parallel if
+        `processes` was set.
+        '''
+        pending = []
+        known = []
+        # The lock is not held across `yield`s, so that a consumer may run
+        # for as long as it likes between devices.
+        with self._update_lock:
+            devices = list(self.devices)
+            for video_device in devices:
+                if is_ignored_device(video_device):
+                    continue
+                if not refresh and video_device in self.capabilities:
+                    known.append((video_device,
+                                  self.capabilities[video_device]))
+                    continue
+                identity = self.get_device_identity(video_device)
+                self.identities[video_device] = identity
+                if self.cache is not None and not refresh:
+                    records = self.cache.get(video_device, identity)
+                    if records is not None:
+                        video_caps = StoredVideoSourceCapabilities(records)
+                        self.capabilities[video_device] = video_caps
+                        known.append((video_device, video_caps))
+                        continue
+                pending.append((video_device, identity))
+        for video_device, video_caps in known:
+            yield video_device, video_caps
+        if self.processes and len(pending) > 1:
+            probed = self._probe_parallel([d for d, i in pending])
+        else:
+            probed = self._probe_serial([d for d, i in pending])
+        identities = dict(pending)
+        for video_device, video_caps in probed:
+            with self._update_lock:
+                self.capabilities[video_device] = video_caps
+                if self.cache is not None:
+                    previous = self.cache.get_fingerprint(video_device)
+                    if previous not in (None, video_caps.fingerprint):
+                        logging.info('caps of device %s have changed' %
+                                     video_device)
+                    self.cache.set(video_device, identities[video_device],
+                                   video_caps.to_records(),
+                                   fingerprint=video_caps.fingerprint)
+            yield video_device, video_caps
+        if self.cache is not None:
+            with self._update_lock:
+                self.cache.prune(devices)
+                self.cache.save()
+
+    def update_devices(self):
+        '''
+        Re-list the available devices, probe only those that were added or
+        whose identity changed, and forget those that were removed.
+
+        Returns `(added, removed, changed)`, and calls each of
+        `device_change_callbacks` with the same arguments if anything
+        changed.
+        '''
+        with self._update_lock:
             try:
-                video_caps = GstVideoSourceCapabilities(video_source)
-            except gst.LinkError:
+                devices = self.backend.list_devices()
+            except DeviceNotFound:
+                devices = []
+            devices = [d for d in devices if not is_ignored_device(d)]
+            known = set(self.identities)
+            added = [d for d in devices if d not in known]
+            removed = sorted(known - set(devices))
+            changed = [d for d in devices if d in known and
+                       self.get_device_identity(d) != self.identities[d]]
+            for video_device in removed + changed:
+                self.capabilities.pop(video_device, None)
+                self.identities.pop(video_device, None)
+            self.devices = devices
+            for video_device_caps in self._device_iter():
+                pass
+            if added or removed or changed:
+                self._mode_index = None
+        if added or removed or changed:
+            for callback in self.device_change_callbacks:
+                callback(added, removed, changed)
+        return added, removed, changed
+
+    def get_fingerprints(self, refresh=False):
+        '''
+        Return a dictionary mapping each device to the fingerprint of its
+        modes (see :attr:`GstVideoSourceCapabilities.fingerprint`).
+        '''
+        return dict([(video_device, video_caps.fingerprint)
+                     for video_device, video_caps in
+                     self._device_iter(refresh=refresh)])
+
+    def diff(self, device_modes, refresh=False):
+        '''
+        Return the :class:`fingerprint.ModeDiff` of each device whose modes
+        differ from `device_modes`, a dictionary mapping devices to
+        canonical modes (e.g., from an earlier :meth:`get_canonical_modes`).
+        '''
+        return diff_devices(device_modes, self.get_canonical_modes(refresh))
+
+    def get_canonical_modes(self, refresh=False):
+        return dict([(video_device, video_caps.canonical_modes)
+                     for video_device, video_caps in
+                     self._device_iter(refresh=refresh)])
+
+    def _probe_serial(self, video_devices):
+        for video_device in video_devices:
+            with self._update_lock:
+                video_caps = self.backend.probe(video_device)
+            if video_caps is None:
                 logging.warning('error querying device %s (skipping)' % video_device)
                 continue
             yield video_device, video_caps
 
-    @staticmethod
-    def get_caps_string(extracted_cap):
-        return '{name:s},width={width:d},height={height:d},fourcc={fourcc:s},'\
-                'framerate={framerate.num:d}/{framerate.denom:d}'.format(**extracted_cap)
+    def _probe_parallel(self, video_devices):
+        '''
+        Probe devices across a pool of at most `processes` workers, each
+        with its own GStreamer context.
+
+        Each device is given `probe_timeout` seconds once a worker is
+        available to it, so a hung device is skipped without stalling the
+        others.  Devices are yielded as soon as they have been probed, in
+        the order they complete.
+        '''
+        processes = min(self.processes, len(video_devices))
+        pool = Pool(processes)
+        try:
+            start = time.time()
+            results = [(start + (i // processes + 1) * self.probe_timeout,
+                        video_device,
+                        pool.apply_async(probe_device_records,
+                                         (self.backend, video_device)))
+                       for i, video_device in enumerate(video_devices)]
+            while results:
+                pending = []
+                for deadline, video_device, result in results:
+                    if not result.ready():
+                        if time.time() < deadline:
+                            pending.append((deadline, video_device, result))
+                        else:
+                            logging.warning('timeout querying device %s '
+                                            '(skipping)' % video_device)
+                        continue
+                    try:
+                        probed = result.get()
+                    except Exception:
+                        logging.warning('error querying device %s (skipping)'
+                                        % video_device, exc_info=True)
+                        continue
+                    if probed is None:
+                        logging.warning('error querying device %s (skipping)'
+                                        % video_device)
+                        continue
+                    records, probe_duration = probed
+                    video_caps = StoredVideoSourceCapabilities(records)
+                    video_caps.probe_duration = probe_duration
+                    yield video_device, video_caps
+                results = pending
+                if results:
+                    # Wait for the next result, or for the earliest deadline.
+                    results[0][2].wait(min(.05, max(0, min(
+                            d for d, v, r in results) - time.time())))
+        finally:
+            # Terminate rather than close so that workers stuck on a hung
+            # device do not block the join.
+            pool.terminate()
+            pool.join()
+
+    get_caps_string = staticmethod(get_caps_string)
     
+    def iter_device_extracted_caps(self, dimensions=None, framerate=None,
+            format_=None, name=None, refresh=False, expand_ranges=False):
+        '''
+        Lazily yield `(video_device, extracted_cap)` for each concrete mode
+        of each device.
+        '''
+        for video_device, video_caps in self._device_iter(refresh=refresh):
+            for cap in video_caps.iter_extracted_caps(dimensions=dimensions,
+                    framerate=framerate, format_=format_, name=name,
+                            expand_ranges=expand_ranges):
+                yield video_device, cap
+
     def _query_device_extracted_caps(self, pipe_conn, dimensions=None,
-            framerate=None, format_=None, name=None):
+            framerate=None, format_=None, name=None, refresh=False,
+            expand_ranges=False):
         extracted_device_caps = {}
-        for video_device, video_caps in self._device_iter():
+        for video_device, video_caps in self._device_iter(refresh=refresh):
             print video_device, video_caps
-            final_caps = []
-            combined_caps = video_caps.get_extracted_allowed_caps(
-                    dimensions=dimensions, framerate=framerate, format_=format_,
-                            name=name)
-            for combined_cap in combined_caps:
-                framerates = combined_cap['framerate']
-                del combined_cap['format']
-                for framerate in framerates:
-                    cap = combined_cap.copy()
-                    cap['framerate'] = framerate
-                    final_caps.append(cap)
-            extracted_device_caps[video_device] = final_caps
+            extracted_device_caps[video_device] = list(
+                    video_caps.iter_extracted_caps(dimensions=dimensions,
+                            framerate=framerate, format_=format_, name=name,
+                                    expand_ranges=expand_ranges))
         #pipe_conn.send(extracted_device_caps)
         return extracted_device_caps
 
     def query_device_extracted_caps(self, dimensions=None, framerate=None, format_=None,
-            name=None):
+            name=None, refresh=False, expand_ranges=False):
         #master_pipe, worker_pipe = Pipe()
         #p = Process(target=self._query_device_extracted_caps, args=(worker_pipe,
                 #), kwargs={ 'dimensions': dimensions, 'framerate': framerate,
@@ -122,18 +384,18 @@ class GstVideoSourceManager(object):
         #p.join()
         extracted_device_caps = self._query_device_extracted_caps(None,
                 dimensions=dimensions, framerate=framerate, format_=format_,
-                        name=name)
+                        name=name, refresh=refresh, expand_ranges=expand_ranges)
         return extracted_device_caps
 
     def query_device_caps(self, dimensions=None, framerate=None, format_=None,
-            name=None):
+            name=None, refresh=False):
         return dict([(video_device, video_caps.get_allowed_caps(dimensions=dimensions,
                 framerate=framerate, format_=format_, name=name))
-                        for video_device, video_caps in self._device_iter()])
+                        for video_device, video_caps in self._device_iter(refresh=refresh)])
 
     def query_devices(self, dimensions=None, framerate=None, format_=None,
-            name=None):
-        for video_device, video_caps in self._device_iter():
+            name=None, refresh=False):
+        for video_device, video_caps in self._device_iter(refresh=refresh):
             print '%s:' % getattr(video_device, 'name', video_device)
             for k, v in video_caps.unique_settings(video_caps.get_allowed_caps(
                     dimensions=dimensions, framerate=framerate,
@@ -141,40 +403,98 @@ class GstVideoSourceManager(object):
                 print 3 * ' ', '%s: %s' % (k, v)
             print 72 * '-'
 
+    @property
+    def mode_index(self):
+        '''
+        :class:`ModeIndex` over all modes of the known devices, built on
+        first access and rebuilt after :meth:`update_devices` reports a
+        change.
+        '''
+        with self._update_lock:
+            if self._mode_index is None:
+                self._mode_index = ModeIndex(get_available_video_modes(self))
+            return self._mode_index
+
     @staticmethod
-    def validate(extracted_caps):
-        try:
-            extracted_caps = sorted(extracted_caps.items())
-        except:
-            raise
-        video_modes = get_available_video_modes()
-        mode_map = dict([(sorted(v), v) for v in video_modes])
-        if extracted_caps not in mode_map:
-            raise ValueError, 'Unsupported video mode'
-        return mode_map[extracted_caps]
+    def validate(extracted_caps, mode_index=None):
+        '''
+        Return the supported mode matching `extracted_caps` or raise
+        `ValueError`.
+
+        Pass the `mode_index` of a long-lived manager to validate without
+        enumerating devices.
+        '''
+        if mode_index is None:
+            mode_index = ModeIndex(get_available_video_modes())
+        return mode_index.validate(extracted_caps)
 
 
 class GstVideoSourceCapabilities(object):
-    def __init__(self, video_source):
-        pipeline = gst.Pipeline()
-        source_pad = video_source.get_pad('src')
-        video_sink = gst.element_factory_make('autovideosink', 'video_sink')
-        pipeline.add(video_source)
-        pipeline.add(video_sink)
-        try:
-            video_source.link(video_sink)
-            pipeline.set_state(gst.STATE_READY)
-            self.allowed_caps = [dict([(k, c[k])
-                    for k in c.keys()] + [('name', c.get_name())])
-                            for c in source_pad.get_allowed_caps()]
-            pipeline.set_state(gst.STATE_NULL)
-            self._allowed_info = self.unique_settings(self.allowed_caps)
-        finally:
-            del pipeline
+    # Seconds spent probing the device (`None` if restored from records).
+    probe_duration = None
+    _canonical_modes = None
+
+    def __init__(self, video_source, caps_probe=None):
+        '''
+        Query the caps of `video_source` through `caps_probe` (by default,
+        the shared probe returned by :func:`get_caps_probe`).
+        '''
+        if caps_probe is None:
+            from .elements import get_caps_probe
+
+            caps_probe = get_caps_probe()
+        start = time.time()
+        self.allowed_caps = caps_probe.query(video_source)
+        self.probe_duration = time.time() - start
+        self._build_index()
+
+    def _build_index(self):
+        '''
+        Decode each allowed cap once and index the resulting records.
+        '''
+        records = []
+        for c in self.allowed_caps:
+            # Extract the mode space first, since `extract_dimensions`
+            # collapses dimension ranges in place.
+            space = self.extract_mode_space(c)
+            width, height = self.extract_dimensions(c)
+            records.append(CapsRecord(c['name'], width, height,
+                                      self.extract_format(c),
+                                      self.extract_fps(c), raw=c,
+                                      space=space))
+        self._set_index(records)
+
+    def _set_index(self, records):
+        self.caps_index = CapsIndex(records)
+        self._allowed_info = self.caps_index.unique_settings()
+
+    def extract_mode_space(self, caps_obj):
+        '''
+        Return a :class:`ModeSpace` preserving dimension and frame rate
+        ranges, rather than collapsing them as `extract_dimensions` and
+        `extract_fps` do.
+        '''
+        dimensions = []
+        for field in ['width', 'height']:
+            value = caps_obj[field]
+            if is_gst_value(value, 'IntRange'):
+                dimensions.append(IntRange(value.low, value.high))
+            elif isinstance(value, list):
+                dimensions.append(tuple(value))
+            else:
+                dimensions.append((value, ))
+        if is_gst_value(caps_obj['framerate'], 'FractionRange'):
+            low, high = (caps_obj['framerate'].low,
+                         caps_obj['framerate'].high)
+            framerates = FractionRange(Fps(low.num, low.denom),
+                                       Fps(high.num, high.denom))
+        else:
+            framerates = self.extract_fps(caps_obj)
+        return ModeSpace(dimensions[0], dimensions[1], framerates)
 
     def extract_dimensions(self, dimensions_obj):
         for field in ['width', 'height']:
-            if isinstance(dimensions_obj[field], gst.IntRange):
+            if is_gst_value(dimensions_obj[field], 'IntRange'):
                 dimensions_obj[field] = dimensions_obj[field].high
         return dimensions_obj['width'], dimensions_obj['height']
 
@@ -187,7 +507,8 @@ class GstVideoSourceCapabilities(object):
             for fps in framerate_obj['framerate']:
                 framerates.append(Fps(fps.num, fps.denom))
         except TypeError:
-            if isinstance(framerate_obj['framerate'], gst.FractionRange):
+            if is_gst_value(framerate_obj['framerate'],
+                            'FractionRange'):
                 for fps in (framerate_obj['framerate'].low,
                         framerate_obj['framerate'].high):
                     framerates.append(Fps(fps.num, fps.denom))
@@ -214,31 +535,67 @@ class GstVideoSourceCapabilities(object):
         return self._allowed_info['names']
 
     def get_extracted_allowed_caps(self, dimensions=None, framerate=None, format_=None, name=None):
-        allowed_caps = self.get_allowed_caps(dimensions=dimensions,
-                framerate=framerate, format_=format_, name=name)
-        for cap in allowed_caps:
+        allowed_caps = []
+        for record in self.caps_index.select(dimensions=dimensions,
+                framerate=framerate, format_=format_, name=name):
+            cap = dict(record.raw)
+            cap['width'], cap['height'] = record.dimensions
             if framerate:
                 cap['framerate'] = (framerate, )
             else:
-                cap['framerate'] = self.extract_fps(cap)
-            cap['dimensions'] = self.extract_dimensions(cap)
-            cap['fourcc'] = self.extract_format(cap)
+                cap['framerate'] = list(record.framerates)
+            cap['dimensions'] = record.dimensions
+            cap['fourcc'] = record.fourcc
+            allowed_caps.append(cap)
         return allowed_caps
 
+    def iter_extracted_caps(self, dimensions=None, framerate=None,
+                            format_=None, name=None, expand_ranges=False,
+                            step=None):
+        '''
+        Lazily yield one extracted cap per concrete mode (i.e., with a
+        single framerate).
+
+        If `expand_ranges` is `True`, dimension and frame rate ranges are
+        expanded into concrete modes (see :meth:`ModeSpace.iter_modes`)
+        instead of being collapsed to their bounds.
+        '''
+        if expand_ranges:
+            records = self.caps_index.select(format_=format_, name=name)
+        else:
+            records = self.caps_index.select(dimensions=dimensions,
+                    framerate=framerate, format_=format_, name=name)
+        for record in records:
+            if expand_ranges:
+                modes = record.space.iter_modes(dimensions=dimensions,
+                                                framerate=framerate,
+                                                step=step)
+            else:
+                modes = ((record.width, record.height, fps)
+                         for fps in ((framerate, ) if framerate
+                                     else record.framerates))
+            for width, height, fps in modes:
+                cap = dict(record.raw)
+                cap.pop('format', None)
+                cap['width'], cap['height'] = width, height
+                cap['dimensions'] = width, height
+                cap['fourcc'] = record.fourcc
+                cap['framerate'] = Fps(*fps)
+                yield cap
+
+    def supports(self, width, height, framerate, format_=None, name=None):
+        '''
+        Return `True` if the device supports `width`x`height` at
+        `framerate`, testing against the full advertised ranges.
+        '''
+        return any(record.space.supports(width, height, framerate)
+                   for record in self.caps_index.select(format_=format_,
+                                                        name=name))
+
     def get_allowed_caps(self, dimensions=None, framerate=None, format_=None, name=None):
-        allowed_caps = self.allowed_caps[:]
-        if dimensions:
-            allowed_caps = [c for c in allowed_caps
-                    if dimensions == self.extract_dimensions(c)]
-        if framerate:
-            allowed_caps = [c for c in allowed_caps
-                    if framerate in self.extract_fps(c)]
-        if format_:
-            allowed_caps = [c for c in allowed_caps
-                    if format_ == self.extract_format(c)]
-        if name:
-            allowed_caps = [c for c in allowed_caps if name == c['name']]
-        return allowed_caps
+        return [record.raw for record in self.caps_index.select(
+                dimensions=dimensions, framerate=framerate, format_=format_,
+                name=name)]
 
     def unique_settings(self, caps):
         framerates = []
@@ -257,25 +614,66 @@ class GstVideoSourceCapabilities(object):
                 info[k] = v
         return info
 
+    def to_records(self):
+        '''
+        Return the allowed caps as JSON-serializable records, suitable for
+        :class:`StoredVideoSourceCapabilities`.
+        '''
+        records = []
+        for r in self.caps_index.records:
+            record = {'name': r.name, 'width': r.width, 'height': r.height,
+                      'fourcc': r.fourcc,
+                      'framerates': [list(fps) for fps in r.framerates]}
+            range_fields = r.space.range_fields()
+            if range_fields:
+                record['ranges'] = range_fields
+            records.append(record)
+        return records
 
-class FilteredInput(gst.Bin):
-    def __init__(self, name, caps_str, video_src):
-        super(FilteredInput, self).__init__(name)
-
-        try:
-            caps = gst.Caps(caps_str)
-        except (Exception, ), why:
-            traceback.print_exc()
-            print 'name: {}, caps_str: "{}"'.format(name, caps_str)
-            raise
-        caps_filter = gst.element_factory_make('capsfilter', 'caps_filter')
-        caps_filter.set_property('caps', caps)
+    @property
+    def canonical_modes(self):
+        '''
+        Sorted tuple of immutable :class:`fingerprint.ModeRecord`, one per
+        mode.
+        '''
+        if self._canonical_modes is None:
+            self._canonical_modes = canonical_modes(self.to_records())
+        return self._canonical_modes
 
-        self.add(video_src, caps_filter)
-        video_src.link(caps_filter)
+    @property
+    def fingerprint(self):
+        '''
+        Content hash of :attr:`canonical_modes`, stable across processes
+        and probes.
+        '''
+        return fingerprint(self.canonical_modes)
+
+
+class StoredVideoSourceCapabilities(GstVideoSourceCapabilities):
+    '''
+    Capabilities restored from records (see
+    :meth:`GstVideoSourceCapabilities.to_records`), without probing the
+    device.
+    '''
+    def __init__(self, records):
+        self.allowed_caps = []
+        caps_records = []
+        for r in records:
+            framerates = [Fps(*fps) for fps in r['framerates']]
+            c = {'name': r['name'], 'width': r['width'],
+                 'height': r['height'], 'format': r['fourcc'],
+                 'framerate': framerates}
+            space = ModeSpace.from_range_fields(r.get('ranges', {}),
+                                                r['width'], r['height'],
+                                                framerates)
+            self.allowed_caps.append(c)
+            caps_records.append(CapsRecord(r['name'], r['width'],
+                                           r['height'], r['fourcc'],
+                                           framerates, raw=c, space=space))
+        self._set_index(caps_records)
 
-        src_gp = gst.GhostPad("src", caps_filter.get_pad('src'))
-        self.add_pad(src_gp)
+    def extract_format(self, format_obj):
+        return format_obj['format']
 
 
 def parse_args():
@@ -302,26 +700,91 @@ Queries for supported video modes for GStreamer input devices.""",
     parser.add_argument('--stream_name',
                     action='store', dest='stream_name',
                     help='stream name (e.g., "video/x-raw-yuv")')
+    parser.add_argument('--expand_ranges',
+                    action='store_true', dest='expand_ranges',
+                    help='expand continuous dimension/framerate ranges into '
+                    'standard modes')
+    parser.add_argument('--processes',
+                    action='store', dest='processes', type=int,
+                    help='number of worker processes used to probe devices')
+    parser.add_argument('--json',
+                    action='store_const', dest='output', const='json',
+                    help='write modes as a JSON list')
+    parser.add_argument('--ndjson',
+                    action='store_const', dest='output', const='ndjson',
+                    help='stream modes as newline-delimited JSON, one record '
+                    'per mode, as soon as each device has been probed')
+    parser.add_argument('--refresh',
+                    action='store_true', dest='refresh',
+                    help='probe devices even if cached caps are available')
     args = parser.parse_args()
     
     return args
 
 
-def format_cap(c):
-    return '[{width:4d} {height:4d} {fps:2.0f}fps '\
-        '({fourcc:s})]'.format(fps=c['framerate'].num / c['framerate'].denom, **c)
-                                                                 
+def iter_mode_records(video_source_manager, refresh=False,
+                      expand_ranges=False, **kwargs):
+    '''
+    Probe each device once and lazily yield one JSON-serializable record per
+    mode, as soon as the device's probe has finished.
+
+    Each record includes the time spent probing its device
+    (`probe_duration`, `null` if the caps were cached) and the time since
+    the query started (`elapsed`), both in seconds.
+    '''
+    start = time.time()
+    for i, (video_device, video_caps) in enumerate(
+            video_source_manager._device_iter(refresh=refresh)):
+        elapsed = time.time() - start
+        for c in video_caps.iter_extracted_caps(expand_ranges=expand_ranges,
+                                                **kwargs):
+            yield {'device': video_device, 'device_index': i,
+                   'name': c['name'], 'width': c['width'],
+                   'height': c['height'], 'fourcc': c['fourcc'],
+                   'framerate': list(c['framerate']),
+                   'fps': c['framerate'].num / c['framerate'].denom,
+                   'probe_duration': video_caps.probe_duration,
+                   'elapsed': elapsed}
+
+
+def write_mode_records(video_source_manager, output='ndjson', stream=None,
+                       **kwargs):
+    if stream is None:
+        stream = sys.stdout
+    records = iter_mode_records(video_source_manager, **kwargs)
+    if output == 'json':
+        json.dump(list(records), stream, indent=2)
+        stream.write('\n')
+        return
+    for record in records:
+        stream.write(json.dumps(record) + '\n')
+        # Flush each record so that consumers can act on a device before
+        # the remaining devices have been probed.
+        stream.flush()
+
 
 def main():
+    if sys.argv[1:2] == ['inventory']:
+        from .inventory import main as inventory_main
+
+        return inventory_main(sys.argv[2:])
     args = parse_args()
 
-    kwargs = {'framerate': args.fps, 'format_': args.format_,
-            'name': args.stream_name}
+    kwargs = {'framerate': Fps(args.fps, 1) if args.fps else None,
+            'format_': args.format_, 'name': args.stream_name,
+            'refresh': args.refresh}
     if args.width and args.height:
         kwargs['dimensions'] = (args.width, args.height)
-    video_source_manager = GstVideoSourceManager()
+    video_source_manager = GstVideoSourceManager(processes=args.processes)
+    if args.output:
+        write_mode_records(video_source_manager, output=args.output,
+                           expand_ranges=args.expand_ranges, **kwargs)
+        return
     video_source_manager.query_devices(**kwargs)
-    caps = video_source_manager.query_device_extracted_caps(**kwargs)
+    # Reuse the capabilities probed by `query_devices`.
+    kwargs['refresh'] = False
+    caps = video_source_manager.query_device_extracted_caps(
+            expand_ranges=args.expand_ranges, **kwargs)
     pprint(sorted(['[%s] %s' % (getattr(device, 'name', device)[:20],
             format_cap(c)) for device, caps in caps.items() for c in caps]))
 
@@ -0,0 +1,89 @@
+import logging
+import threading
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+class DeviceWatcher(object):
+    '''
+    Keep a long-lived :class:`GstVideoSourceManager` in sync with the
+    devices in its `by_id_dir`.
+
+    Uses inotify (through :mod:`pyinotify`) when available, and otherwise
+    polls the directory every `interval` seconds.  Each detected change
+    triggers :meth:`GstVideoSourceManager.update_devices`, which probes only
+    the added or changed devices and calls the manager's
+    `device_change_callbacks` from the watcher thread.  The manager
+    serialises these updates with probes made from other threads.
+    '''
+    def __init__(self, video_source_manager, interval=1., use_inotify=True):
+        self.video_source_manager = video_source_manager
+        self.interval = interval
+        self.use_inotify = use_inotify and pyinotify is not None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        '''
+        Check for device changes once.  Returns `(added, removed,
+        changed)`.
+        '''
+        try:
+            return self.video_source_manager.update_devices()
+        except Exception:
+            logging.warning('error updating devices', exc_info=True)
+            return [], [], []
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        target = self._run_polling
+        if self.use_inotify:
+            try:
+                notifier = self._create_notifier()
+            except Exception:
+                logging.warning('unable to watch %s with inotify (polling)'
+                                % self.video_source_manager.by_id_dir)
+            else:
+                target = lambda: self._run_inotify(notifier)
+        self._thread = threading.Thread(target=target,
+                                        name='DeviceWatcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run_polling(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def _create_notifier(self):
+        watch_manager = pyinotify.WatchManager()
+        mask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE |
+                pyinotify.IN_MOVED_TO | pyinotify.IN_MOVED_FROM |
+                pyinotify.IN_ATTRIB)
+        result = watch_manager.add_watch(
+            self.video_source_manager.by_id_dir, mask, quiet=False)
+        if any(wd < 0 for wd in result.values()):
+            raise OSError('error adding inotify watch')
+        return pyinotify.Notifier(watch_manager, timeout=self.interval * 1000)
+
+    def _run_inotify(self, notifier):
+        try:
+            while not self._stop_event.is_set():
+                if notifier.check_events():
+                    notifier.read_events()
+                    # Discard the individual events; a single update
+                    # re-lists the directory.
+                    notifier.process_events()
+                    self.poll()
+        finally:
+            notifier.stop()
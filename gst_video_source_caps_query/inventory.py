@@ -0,0 +1,302 @@
+'''
+Persistent inventory of probed video modes, across runs and hosts.
+
+Each probe run is appended to a SQLite database, which can then be queried
+(e.g., "which hosts/devices can do 1920x1080@60 MJPG?") without probing any
+hardware::
+
+    python -m gst_video_source_caps_query.gst_video_source_caps_query \
+        inventory record
+    python -m gst_video_source_caps_query.gst_video_source_caps_query \
+        inventory query --width 1920 --height 1080 --fps 60 --format MJPG
+
+Databases from several capture hosts can be merged with
+:meth:`Inventory.merge`.
+'''
+from __future__ import division
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+
+from .cache import get_cache_dir
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    host TEXT NOT NULL,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS devices (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    device TEXT NOT NULL,
+    fingerprint TEXT,
+    PRIMARY KEY (run_id, device)
+);
+CREATE TABLE IF NOT EXISTS modes (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    device TEXT NOT NULL,
+    name TEXT NOT NULL,
+    fourcc TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    fps REAL NOT NULL,
+    fps_num INTEGER NOT NULL,
+    fps_denom INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS modes_device_mode
+    ON modes (device, fourcc, width, height, fps);
+CREATE INDEX IF NOT EXISTS modes_mode
+    ON modes (fourcc, width, height, fps);
+CREATE INDEX IF NOT EXISTS modes_run ON modes (run_id);
+CREATE INDEX IF NOT EXISTS runs_host ON runs (host, timestamp);
+'''
+
+# Frame rates within this tolerance match (e.g., 30000/1001 for 29.97).
+FPS_TOLERANCE = .01
+
+
+def get_default_db_path():
+    return os.path.join(get_cache_dir(), 'inventory.sqlite')
+
+
+class Inventory(object):
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = get_default_db_path()
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.isdir(db_dir):
+            os.makedirs(db_dir)
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, mode_records, host=None, timestamp=None, duration=None,
+               fingerprints=None):
+        '''
+        Append a run, with the modes in `mode_records` (see
+        :func:`iter_mode_records`), and return the run ID.
+
+        `fingerprints` optionally maps each device to the fingerprint of its
+        modes.  The run is inserted in a single transaction.
+        '''
+        if host is None:
+            host = platform.node()
+        if timestamp is None:
+            timestamp = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                    'INSERT INTO runs (timestamp, host, duration) '
+                    'VALUES (?, ?, ?)', (timestamp, host, duration))
+            run_id = cursor.lastrowid
+            devices = set()
+
+            def iter_rows():
+                for r in mode_records:
+                    device = str(r['device'])
+                    devices.add(device)
+                    num, denom = r['framerate']
+                    yield (run_id, device, r['name'], r['fourcc'],
+                           r['width'], r['height'], round(num / denom, 3),
+                           num, denom)
+
+            self.connection.executemany(
+                    'INSERT INTO modes (run_id, device, name, fourcc, width, '
+                    'height, fps, fps_num, fps_denom) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', iter_rows())
+            fingerprints = fingerprints or {}
+            self.connection.executemany(
+                    'INSERT INTO devices (run_id, device, fingerprint) '
+                    'VALUES (?, ?, ?)',
+                    [(run_id, d, fingerprints.get(d)) for d in devices])
+        return run_id
+
+    def record_probe(self, video_source_manager=None, refresh=True,
+                     host=None, **kwargs):
+        '''
+        Probe the devices of `video_source_manager` (by default, a new
+        manager for the local devices) and record the results as a run.
+        '''
+        from .gst_video_source_caps_query import (GstVideoSourceManager,
+                                                  iter_mode_records)
+
+        if video_source_manager is None:
+            video_source_manager = GstVideoSourceManager()
+        start = time.time()
+        mode_records = list(iter_mode_records(video_source_manager,
+                                              refresh=refresh, **kwargs))
+        duration = time.time() - start
+        fingerprints = dict([(str(d), f) for d, f in
+                             video_source_manager.get_fingerprints().items()])
+        return self.record(mode_records, host=host, timestamp=start,
+                           duration=duration, fingerprints=fingerprints)
+
+    def query(self, width=None, height=None, fps=None, fourcc=None,
+              device=None, host=None, latest=True):
+        '''
+        Return the `(host, device, run_id, timestamp)` rows, as
+        dictionaries, of the devices supporting a mode matching all the
+        given criteria.
+
+        Only the latest run of each host is searched, unless `latest` is
+        `False`.
+        '''
+        conditions = []
+        parameters = []
+        for column, value in (('modes.fourcc', fourcc),
+                              ('modes.width', width),
+                              ('modes.height', height),
+                              ('modes.device', device),
+                              ('runs.host', host)):
+            if value is not None:
+                conditions.append('%s = ?' % column)
+                parameters.append(value)
+        if fps is not None:
+            conditions.append('modes.fps BETWEEN ? AND ?')
+            parameters.extend([fps - FPS_TOLERANCE, fps + FPS_TOLERANCE])
+        if latest:
+            # By timestamp rather than ID, since merged runs may be older
+            # than runs already recorded.
+            conditions.append('modes.run_id IN (SELECT id FROM runs r '
+                              'WHERE timestamp = (SELECT MAX(timestamp) '
+                              'FROM runs WHERE host = r.host))')
+        sql = ('SELECT DISTINCT runs.host, modes.device, modes.run_id, '
+               'runs.timestamp FROM modes JOIN runs ON runs.id = '
+               'modes.run_id')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY runs.host, modes.device, runs.timestamp'
+        return [dict(zip(row.keys(), row))
+                for row in self.connection.execute(sql, parameters)]
+
+    def get_modes(self, run_id, device=None):
+        sql = 'SELECT * FROM modes WHERE run_id = ?'
+        parameters = [run_id]
+        if device is not None:
+            sql += ' AND device = ?'
+            parameters.append(device)
+        return [dict(zip(row.keys(), row))
+                for row in self.connection.execute(sql, parameters)]
+
+    def get_runs(self, host=None):
+        sql = ('SELECT runs.*, COUNT(modes.run_id) AS mode_count FROM runs '
+               'LEFT JOIN modes ON modes.run_id = runs.id')
+        parameters = []
+        if host is not None:
+            sql += ' WHERE runs.host = ?'
+            parameters.append(host)
+        sql += ' GROUP BY runs.id ORDER BY runs.timestamp'
+        return [dict(zip(row.keys(), row))
+                for row in self.connection.execute(sql, parameters)]
+
+    def merge(self, db_path):
+        '''
+        Append the runs of the inventory at `db_path` (e.g., collected on
+        another capture host), skipping runs (by host and timestamp) already
+        recorded, and return the number of runs appended.
+        '''
+        other = Inventory(db_path)
+        merged = 0
+        try:
+            for run in other.get_runs():
+                if self.connection.execute(
+                        'SELECT 1 FROM runs WHERE host = ? AND timestamp = ?',
+                        (run['host'], run['timestamp'])).fetchone():
+                    continue
+                modes = other.get_modes(run['id'])
+                for mode in modes:
+                    mode['framerate'] = mode['fps_num'], mode['fps_denom']
+                fingerprints = dict(other.connection.execute(
+                        'SELECT device, fingerprint FROM devices '
+                        'WHERE run_id = ?', (run['id'], )).fetchall())
+                self.record(modes, host=run['host'],
+                            timestamp=run['timestamp'],
+                            duration=run['duration'],
+                            fingerprints=fingerprints)
+                merged += 1
+        finally:
+            other.close()
+        return merged
+
+
+def parse_args(args=None):
+    """Parses inventory arguments."""
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(prog='gst_video_source_caps_query inventory',
+                            description='Records probed video modes in a '
+                            'SQLite database and queries them.')
+    parser.add_argument('--db', help='database path (default: %s)' %
+                        get_default_db_path())
+    subparsers = parser.add_subparsers(dest='command')
+
+    record = subparsers.add_parser('record', help='probe the local devices '
+                                   'and record the modes')
+    record.add_argument('--host', help='host name (default: %s)' %
+                        platform.node())
+    record.add_argument('--cached', action='store_false', dest='refresh',
+                        help='use cached caps rather than probing')
+    record.add_argument('--expand_ranges', action='store_true')
+    record.add_argument('--processes', type=int,
+                        help='number of worker processes used to probe '
+                        'devices')
+
+    query = subparsers.add_parser('query', help='find the hosts/devices '
+                                  'supporting a mode')
+    query.add_argument('--width', type=int)
+    query.add_argument('--height', type=int)
+    query.add_argument('--fps', type=float)
+    query.add_argument('--format', dest='fourcc')
+    query.add_argument('--device')
+    query.add_argument('--host')
+    query.add_argument('--all-runs', action='store_false', dest='latest',
+                       help='search every run rather than the latest run of '
+                       'each host')
+
+    runs = subparsers.add_parser('runs', help='list the recorded runs')
+    runs.add_argument('--host')
+
+    merge = subparsers.add_parser('merge', help='append the runs of another '
+                                  'inventory database')
+    merge.add_argument('db_path')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    inventory = Inventory(args.db)
+    try:
+        if args.command == 'record':
+            from .gst_video_source_caps_query import GstVideoSourceManager
+
+            run_id = inventory.record_probe(
+                    GstVideoSourceManager(processes=args.processes),
+                    refresh=args.refresh, host=args.host,
+                    expand_ranges=args.expand_ranges)
+            print 'recorded run %d (%d modes)' % (
+                    run_id, len(inventory.get_modes(run_id)))
+        elif args.command == 'query':
+            for row in inventory.query(width=args.width, height=args.height,
+                                       fps=args.fps, fourcc=args.fourcc,
+                                       device=args.device, host=args.host,
+                                       latest=args.latest):
+                sys.stdout.write(json.dumps(row) + '\n')
+        elif args.command == 'runs':
+            for run in inventory.get_runs(args.host):
+                sys.stdout.write(json.dumps(run) + '\n')
+        elif args.command == 'merge':
+            print 'merged %d runs' % inventory.merge(args.db_path)
+    finally:
+        inventory.close()
+
+
+if __name__ == '__main__':
+    main()
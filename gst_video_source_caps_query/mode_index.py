@@ -0,0 +1,82 @@
+from collections import defaultdict
+import math
+
+
+def mode_key(video_mode):
+    '''
+    Return a hashable, canonical key for a video mode dictionary, as
+    returned by :func:`get_available_video_modes`.
+    '''
+    num, denom = video_mode['framerate']
+    return (video_mode['device'], video_mode['name'],
+            int(video_mode['width']), int(video_mode['height']),
+            video_mode['fourcc'], int(num), int(denom))
+
+
+def _mode_distance(video_mode, target):
+    '''
+    Distance between two modes: difference in (log) pixel count first, then
+    in frame rate.
+    '''
+    pixels = video_mode['width'] * video_mode['height']
+    target_pixels = target['width'] * target['height']
+    fps = video_mode['framerate'][0] / float(video_mode['framerate'][1])
+    target_fps = target['framerate'][0] / float(target['framerate'][1])
+    return (abs(math.log(pixels / float(target_pixels))),
+            abs(fps - target_fps))
+
+
+class ModeIndex(object):
+    '''
+    Lookup table over a list of video modes, built once from probe
+    results.
+
+    Validation is a single dictionary lookup and nearest-match lookups only
+    scan the (small) bucket of modes sharing the device, stream name and
+    fourcc of the requested mode.
+    '''
+    def __init__(self, video_modes):
+        self.modes = {}
+        self._by_size = defaultdict(list)
+        self._by_format = defaultdict(list)
+        self._by_device = defaultdict(list)
+        for video_mode in video_modes:
+            key = mode_key(video_mode)
+            if key in self.modes:
+                continue
+            self.modes[key] = video_mode
+            self._by_size[key[:5]].append(video_mode)
+            self._by_format[(key[0], key[1], key[4])].append(video_mode)
+            self._by_device[key[0]].append(video_mode)
+
+    def __len__(self):
+        return len(self.modes)
+
+    def __contains__(self, video_mode):
+        return mode_key(video_mode) in self.modes
+
+    def validate(self, video_mode):
+        '''
+        Return the indexed mode matching `video_mode`, or raise
+        `ValueError` if the mode is not supported.
+        '''
+        try:
+            return self.modes[mode_key(video_mode)]
+        except KeyError:
+            raise ValueError, 'Unsupported video mode'
+
+    def nearest(self, video_mode):
+        '''
+        Return the supported mode closest to `video_mode` on the same
+        device, preferring the same stream name and fourcc, or `None` if
+        the device has no modes.
+        '''
+        key = mode_key(video_mode)
+        if key in self.modes:
+            return self.modes[key]
+        candidates = (self._by_size.get(key[:5]) or
+                      self._by_format.get((key[0], key[1], key[4])) or
+                      self._by_device.get(key[0]))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda m: _mode_distance(m, video_mode))
@@ -0,0 +1,144 @@
+from array import array
+import json
+import struct
+import sys
+
+from .formats import Fps
+
+
+MAGIC = 'MTB1'
+# Magic, row count, string table size.
+HEADER = struct.Struct('<4sII')
+# Integer columns, with their `array` type codes.
+COLUMNS = (('device', 'H'), ('name', 'H'), ('fourcc', 'I'), ('width', 'I'),
+           ('height', 'I'), ('fps_num', 'I'), ('fps_denom', 'I'))
+# Columns are encoded little-endian.
+BYTESWAP = sys.byteorder != 'little'
+
+
+def fourcc_code(fourcc):
+    if fourcc is None:
+        return 0
+    return struct.unpack('<I', str(fourcc).ljust(4)[:4])[0]
+
+
+def fourcc_string(code):
+    if not code:
+        return None
+    return struct.pack('<I', code).rstrip()
+
+
+class ModeTable(object):
+    '''
+    Columnar table of video modes, as returned by
+    :func:`get_available_video_modes`.
+
+    Device paths and stream names are interned in string tables, and the
+    remaining fields are stored in integer arrays, so that a table of
+    hundreds of modes is encoded (see :meth:`encode`) and decoded in a few
+    array copies, rather than pickling one dictionary per mode.
+
+    Only the mode fields (device, name, width, height, fourcc, framerate)
+    are kept, and devices are decoded as plain strings.
+    '''
+    def __init__(self, devices=None, names=None, columns=None):
+        self.devices = devices or []
+        self.names = names or []
+        if columns is None:
+            columns = dict([(column, array(type_code))
+                            for column, type_code in COLUMNS])
+        self.columns = columns
+        self._device_index = dict([(d, i) for i, d in
+                                   enumerate(self.devices)])
+        self._name_index = dict([(n, i) for i, n in enumerate(self.names)])
+
+    @classmethod
+    def from_video_modes(cls, video_modes):
+        table = cls()
+        for video_mode in video_modes:
+            table.append(video_mode)
+        return table
+
+    def _intern(self, strings, index, value):
+        i = index.get(value)
+        if i is None:
+            i = index[value] = len(strings)
+            strings.append(value)
+        return i
+
+    def append(self, video_mode):
+        num, denom = video_mode['framerate']
+        columns = self.columns
+        columns['device'].append(self._intern(self.devices,
+                                              self._device_index,
+                                              str(video_mode['device'])))
+        columns['name'].append(self._intern(self.names, self._name_index,
+                                            video_mode['name']))
+        columns['fourcc'].append(fourcc_code(video_mode['fourcc']))
+        columns['width'].append(int(video_mode['width']))
+        columns['height'].append(int(video_mode['height']))
+        columns['fps_num'].append(int(num))
+        columns['fps_denom'].append(int(denom))
+
+    def __len__(self):
+        return len(self.columns['width'])
+
+    def __getitem__(self, i):
+        columns = self.columns
+        width, height = columns['width'][i], columns['height'][i]
+        return {'device': self.devices[columns['device'][i]],
+                'name': self.names[columns['name'][i]],
+                'width': width, 'height': height,
+                'dimensions': (width, height),
+                'fourcc': fourcc_string(columns['fourcc'][i]),
+                'framerate': Fps(columns['fps_num'][i],
+                                 columns['fps_denom'][i])}
+
+    def __iter__(self):
+        return (self[i] for i in xrange(len(self)))
+
+    def to_video_modes(self):
+        return list(self)
+
+    @property
+    def nbytes(self):
+        '''
+        Size of the encoded table, in bytes.
+        '''
+        return len(self.encode())
+
+    def encode(self):
+        '''
+        Return the table as a byte string: a header, the string tables as
+        JSON and each column as a little-endian array.
+        '''
+        strings = json.dumps([self.devices, self.names])
+        chunks = [HEADER.pack(MAGIC, len(self), len(strings)), strings]
+        for column, type_code in COLUMNS:
+            values = self.columns[column]
+            if BYTESWAP:
+                values = array(type_code, values)
+                values.byteswap()
+            chunks.append(values.tostring())
+        return ''.join(chunks)
+
+    @classmethod
+    def decode(cls, data):
+        magic, row_count, strings_size = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError, 'Not an encoded mode table'
+        offset = HEADER.size
+        devices, names = [[s.encode('utf-8') for s in strings]
+                          for strings in json.loads(data[offset:offset +
+                                                         strings_size])]
+        offset += strings_size
+        columns = {}
+        for column, type_code in COLUMNS:
+            values = array(type_code)
+            size = row_count * values.itemsize
+            values.fromstring(data[offset:offset + size])
+            if BYTESWAP:
+                values.byteswap()
+            columns[column] = values
+            offset += size
+        return cls(devices, names, columns)
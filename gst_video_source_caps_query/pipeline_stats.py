@@ -0,0 +1,89 @@
+from __future__ import division
+from collections import deque
+import math
+import time
+
+
+class PipelineStats(object):
+    '''
+    Throughput, jitter and state-change timing of a capture pipeline.
+
+    Buffer arrival times are recorded (e.g., from a pad probe) with
+    :meth:`on_buffer`; the rate and jitter reported by :meth:`snapshot` are
+    computed over the last `window` inter-frame intervals.
+    '''
+    def __init__(self, nominal_fps=None, window=120, message_count=10):
+        self.nominal_fps = nominal_fps
+        self.intervals = deque(maxlen=window)
+        self.frame_count = 0
+        self.first_frame_time = None
+        self.last_frame_time = None
+        self.negotiated_caps = None
+        # Latency (in seconds) of the last transition to each state.
+        self.state_latency = {}
+        self._state_requested = None
+        self.errors = deque(maxlen=message_count)
+        self.warnings = deque(maxlen=message_count)
+
+    def on_buffer(self, now=None):
+        if now is None:
+            now = time.time()
+        if self.last_frame_time is not None:
+            self.intervals.append(now - self.last_frame_time)
+        else:
+            self.first_frame_time = now
+        self.last_frame_time = now
+        self.frame_count += 1
+
+    def on_state_requested(self, now=None):
+        '''
+        Mark the start of a state change, timed by :meth:`on_state_changed`.
+        '''
+        self._state_requested = time.time() if now is None else now
+
+    def on_state_changed(self, state, now=None):
+        if self._state_requested is None:
+            return
+        if now is None:
+            now = time.time()
+        self.state_latency[state] = now - self._state_requested
+
+    def on_error(self, message):
+        self.errors.append({'time': time.time(), 'message': message})
+
+    def on_warning(self, message):
+        self.warnings.append({'time': time.time(), 'message': message})
+
+    @property
+    def fps(self):
+        if not self.intervals:
+            return None
+        mean = sum(self.intervals) / len(self.intervals)
+        return 1. / mean if mean > 0 else None
+
+    @property
+    def jitter(self):
+        '''
+        Standard deviation of the inter-frame interval, in seconds.
+        '''
+        if len(self.intervals) < 2:
+            return None
+        mean = sum(self.intervals) / len(self.intervals)
+        return math.sqrt(sum((i - mean) ** 2 for i in self.intervals) /
+                         (len(self.intervals) - 1))
+
+    def snapshot(self):
+        fps = self.fps
+        if fps is not None and self.nominal_fps:
+            rate_ratio = fps / self.nominal_fps
+        else:
+            rate_ratio = None
+        return {'frames': self.frame_count, 'fps': fps,
+                'nominal_fps': self.nominal_fps, 'rate_ratio': rate_ratio,
+                'jitter': self.jitter,
+                'max_interval': max(self.intervals) if self.intervals
+                else None,
+                'last_frame_time': self.last_frame_time,
+                'negotiated_caps': self.negotiated_caps,
+                'state_latency': dict(self.state_latency),
+                'errors': list(self.errors), 'warnings': list(self.warnings)}
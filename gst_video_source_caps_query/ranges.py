@@ -0,0 +1,198 @@
+from fractions import Fraction
+from itertools import product
+
+
+# Candidates used to expand continuous ranges into concrete modes.
+STANDARD_DIMENSIONS = ((160, 120), (176, 144), (320, 240), (352, 288),
+                       (640, 360), (640, 480), (800, 600), (960, 540),
+                       (1024, 768), (1280, 720), (1280, 960), (1280, 1024),
+                       (1600, 1200), (1920, 1080), (2560, 1440),
+                       (3840, 2160))
+STANDARD_FRAMERATES = ((5, 1), (10, 1), (15, 1), (24000, 1001), (24, 1),
+                       (25, 1), (30000, 1001), (30, 1), (50, 1),
+                       (60000, 1001), (60, 1), (120, 1))
+
+
+def as_fraction(fps):
+    return Fraction(int(fps[0]), int(fps[1]))
+
+
+class IntRange(object):
+    __slots__ = ('low', 'high', 'step')
+
+    def __init__(self, low, high, step=1):
+        self.low = low
+        self.high = high
+        self.step = step
+
+    def __contains__(self, value):
+        return (self.low <= value <= self.high and
+                (value - self.low) % self.step == 0)
+
+    def __iter__(self):
+        return iter(xrange(self.low, self.high + 1, self.step))
+
+    def __len__(self):
+        return (self.high - self.low) // self.step + 1
+
+    def __repr__(self):
+        return 'IntRange(%r, %r, %r)' % (self.low, self.high, self.step)
+
+
+class FractionRange(object):
+    '''
+    Closed interval of frame rates.  `low` and `high` are `(num, denom)`
+    pairs.
+    '''
+    __slots__ = ('low', 'high', '_interval')
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+        self._interval = as_fraction(low), as_fraction(high)
+
+    def __contains__(self, fps):
+        return self._interval[0] <= as_fraction(fps) <= self._interval[1]
+
+    def __repr__(self):
+        return 'FractionRange(%r, %r)' % (self.low, self.high)
+
+
+class ModeSpace(object):
+    '''
+    Set of modes described by one caps structure.
+
+    `widths` and `heights` are each either a sequence of values or an
+    :class:`IntRange`; `framerates` is either a sequence of `(num, denom)`
+    pairs or a :class:`FractionRange`.  Membership is tested by interval
+    arithmetic, and concrete modes are generated lazily.
+    '''
+    __slots__ = ('widths', 'heights', 'framerates', '_fractions')
+
+    def __init__(self, widths, heights, framerates):
+        self.widths = widths
+        self.heights = heights
+        self.framerates = framerates
+        if isinstance(framerates, FractionRange):
+            self._fractions = None
+        else:
+            self._fractions = frozenset(as_fraction(fps)
+                                        for fps in framerates)
+
+    @property
+    def is_discrete(self):
+        return not any(isinstance(v, (IntRange, FractionRange))
+                       for v in (self.widths, self.heights, self.framerates))
+
+    def supports(self, width=None, height=None, framerate=None):
+        if width is not None and width not in self.widths:
+            return False
+        if height is not None and height not in self.heights:
+            return False
+        if framerate is not None:
+            if self._fractions is None:
+                return framerate in self.framerates
+            return as_fraction(framerate) in self._fractions
+        return True
+
+    @staticmethod
+    def _bounds(values):
+        if isinstance(values, IntRange):
+            return values.low, values.high
+        return min(values), max(values)
+
+    def iter_dimensions(self, step=None):
+        '''
+        Yield `(width, height)` pairs.
+
+        Continuous ranges are sampled at their endpoints and at standard
+        dimensions, or at every `step` pixels if `step` is given.
+        '''
+        if step is not None:
+            widths = (self.widths if not isinstance(self.widths, IntRange)
+                      else IntRange(self.widths.low, self.widths.high,
+                                    max(step, self.widths.step)))
+            heights = (self.heights if not isinstance(self.heights, IntRange)
+                       else IntRange(self.heights.low, self.heights.high,
+                                     max(step, self.heights.step)))
+            for dimensions in product(widths, heights):
+                yield dimensions
+            return
+        if not isinstance(self.widths, IntRange) and not isinstance(
+                self.heights, IntRange):
+            for dimensions in product(self.widths, self.heights):
+                yield dimensions
+            return
+        (min_width, max_width), (min_height, max_height) = \
+            self._bounds(self.widths), self._bounds(self.heights)
+        # Standard sizes keep their aspect ratio; the range endpoints are
+        # paired with each other.
+        seen = set()
+        for dimensions in STANDARD_DIMENSIONS + ((min_width, min_height),
+                                                 (max_width, max_height)):
+            if dimensions not in seen and self.supports(*dimensions):
+                seen.add(dimensions)
+                yield dimensions
+
+    def iter_framerates(self, candidates=STANDARD_FRAMERATES):
+        if not isinstance(self.framerates, FractionRange):
+            for fps in self.framerates:
+                yield fps
+            return
+        seen = set()
+        for fps in ((self.framerates.low, ) +
+                    tuple(f for f in candidates if f in self.framerates) +
+                    (self.framerates.high, )):
+            if as_fraction(fps) not in seen:
+                seen.add(as_fraction(fps))
+                yield fps
+
+    def iter_modes(self, dimensions=None, framerate=None, step=None):
+        '''
+        Yield `(width, height, framerate)` for concrete modes, optionally
+        restricted to the given `dimensions` and/or `framerate`.
+        '''
+        if dimensions is not None:
+            dimensions_iter = ([dimensions] if self.supports(*dimensions)
+                               else [])
+        else:
+            dimensions_iter = self.iter_dimensions(step=step)
+        if framerate is not None:
+            framerates = [framerate] if self.supports(framerate=framerate) \
+                else []
+        else:
+            framerates = list(self.iter_framerates())
+        for width, height in dimensions_iter:
+            for fps in framerates:
+                yield width, height, fps
+
+    def range_fields(self):
+        '''
+        Return the continuous fields as a JSON-serializable dictionary (empty
+        if the space is discrete).
+        '''
+        fields = {}
+        for field, values in (('width', self.widths),
+                              ('height', self.heights)):
+            if isinstance(values, IntRange):
+                fields[field] = [values.low, values.high, values.step]
+        if isinstance(self.framerates, FractionRange):
+            fields['framerate'] = [list(self.framerates.low),
+                                   list(self.framerates.high)]
+        return fields
+
+    @classmethod
+    def from_range_fields(cls, range_fields, width, height, framerates):
+        '''
+        Inverse of :meth:`range_fields`; discrete fields are taken from
+        `width`, `height` and `framerates`.
+        '''
+        widths, heights = (width, ), (height, )
+        if 'width' in range_fields:
+            widths = IntRange(*range_fields['width'])
+        if 'height' in range_fields:
+            heights = IntRange(*range_fields['height'])
+        if 'framerate' in range_fields:
+            low, high = range_fields['framerate']
+            framerates = FractionRange(tuple(low), tuple(high))
+        return cls(widths, heights, framerates)
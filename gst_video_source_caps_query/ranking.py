@@ -0,0 +1,165 @@
+from __future__ import division
+from collections import OrderedDict
+import math
+
+from .formats import get_caps_string
+
+
+# Default order of preference of fourccs.  Compressed formats come after
+# YUY2 as they cost a decode, but before the other raw formats since they
+# need far less USB bandwidth at high resolutions.
+DEFAULT_FOURCCS = ('YUY2', 'MJPG', 'I420', 'YV12', 'RGB3', 'BGR3', 'GREY')
+
+DEFAULT_WEIGHTS = {'pixel_rate': 1., 'resolution': 2., 'fps': 2.,
+                   'fourcc': 1., 'aspect_ratio': 1.}
+
+
+def get_fps(video_mode):
+    num, denom = video_mode['framerate']
+    return num / denom
+
+
+def get_measured_fps(video_mode):
+    '''
+    Return the frame rate measured for `video_mode` (see
+    :func:`verify.verify_device_modes`), falling back to the advertised
+    frame rate if it has not been measured.
+    '''
+    measured = video_mode.get('measured')
+    if measured and not measured.get('error') and measured.get('fps'):
+        return measured['fps']
+    return get_fps(video_mode)
+
+
+def _closeness(value, target):
+    '''
+    Score in `[0, 1]` of `value` relative to `target`: undershooting the
+    target is penalised more than overshooting it, since a larger mode can
+    still be scaled down.
+    '''
+    ratio = value / target
+    if ratio <= 1:
+        return ratio
+    return 1 / math.sqrt(ratio)
+
+
+class ModeRanker(object):
+    '''
+    Score video modes, as returned by :func:`get_available_video_modes`.
+
+    Each mode gets a score in `[0, 1]`, the weighted mean of:
+
+     - `pixel_rate`: pixels per second, relative to the highest pixel rate
+       among the ranked modes.
+     - `resolution`: closeness to `target_size` (`(width, height)`).
+     - `fps`: closeness to `target_fps`.
+     - `fourcc`: position of the fourcc in `fourccs` (modes with a fourcc
+       not listed score 0).
+     - `aspect_ratio`: closeness to `aspect_ratio` (e.g., `16 / 9`).
+
+    Criteria without a target are ignored.
+
+    If `use_measured` is `True`, the measured frame rate of each mode is
+    used where available (see :func:`get_measured_fps`).
+    '''
+    def __init__(self, target_size=None, target_fps=None,
+                 fourccs=DEFAULT_FOURCCS, aspect_ratio=None, weights=None,
+                 use_measured=False):
+        self.target_size = target_size
+        self.target_fps = target_fps
+        self.fourccs = fourccs
+        self.aspect_ratio = aspect_ratio
+        self.get_fps = get_measured_fps if use_measured else get_fps
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+        if target_size is None:
+            self.weights['resolution'] = 0
+        if target_fps is None:
+            self.weights['fps'] = 0
+        if not fourccs:
+            self.weights['fourcc'] = 0
+        if aspect_ratio is None:
+            self.weights['aspect_ratio'] = 0
+
+    def score_components(self, video_mode, max_pixel_rate):
+        width, height = video_mode['width'], video_mode['height']
+        fps = self.get_fps(video_mode)
+        scores = {'pixel_rate': width * height * fps / max_pixel_rate
+                  if max_pixel_rate else 0}
+        if self.target_size is not None:
+            target_width, target_height = self.target_size
+            scores['resolution'] = _closeness(width * height,
+                                              target_width * target_height)
+        if self.target_fps is not None:
+            scores['fps'] = _closeness(fps, self.target_fps)
+        if self.fourccs:
+            fourccs = list(self.fourccs)
+            if video_mode['fourcc'] in fourccs:
+                scores['fourcc'] = (1 - fourccs.index(video_mode['fourcc']) /
+                                    len(fourccs))
+            else:
+                scores['fourcc'] = 0
+        if self.aspect_ratio is not None:
+            scores['aspect_ratio'] = max(0, 1 - abs(math.log(
+                    width / height / self.aspect_ratio)))
+        return scores
+
+    def score(self, video_mode, max_pixel_rate):
+        scores = self.score_components(video_mode, max_pixel_rate)
+        total_weight = sum(self.weights[k] for k in scores)
+        if not total_weight:
+            return 0
+        return sum(self.weights[k] * v
+                   for k, v in scores.iteritems()) / total_weight
+
+    def rank(self, video_modes):
+        '''
+        Return `(score, video_mode)` pairs, best first.  Modes with equal
+        scores keep their original order.
+        '''
+        video_modes = list(video_modes)
+        max_pixel_rate = max([m['width'] * m['height'] * self.get_fps(m)
+                              for m in video_modes] or [0])
+        scored = [(self.score(m, max_pixel_rate), m) for m in video_modes]
+        # `sorted` is stable, so ties are resolved by the original order.
+        return sorted(scored, key=lambda s: -s[0])
+
+    def top_k(self, video_modes, k=1):
+        '''
+        Return an ordered dictionary mapping each device to its `k` best
+        modes, best first.
+        '''
+        by_device = OrderedDict()
+        for score, video_mode in self.rank(video_modes):
+            device_modes = by_device.setdefault(video_mode['device'], [])
+            if len(device_modes) < k:
+                device_modes.append(video_mode)
+        return by_device
+
+    def best(self, video_modes):
+        '''
+        Return the best mode, or `None` if there are no modes.
+        '''
+        ranked = self.rank(video_modes)
+        return ranked[0][1] if ranked else None
+
+
+def select_best_video_caps(video_modes=None, video_source_manager=None,
+                           **kwargs):
+    '''
+    Return `(device, caps_str)` for the best of `video_modes` (by default,
+    all modes available to `video_source_manager`, which reuses cached
+    capabilities rather than probing again) according to a
+    :class:`ModeRanker` constructed with `kwargs`.
+
+    Headless counterpart of :func:`select_video_caps`.
+    '''
+    from .gst_video_source_caps_query import get_available_video_modes
+
+    if video_modes is None:
+        video_modes = get_available_video_modes(video_source_manager)
+    video_mode = ModeRanker(**kwargs).best(video_modes)
+    if video_mode is None:
+        return None
+    return video_mode['device'], get_caps_string(video_mode)
@@ -0,0 +1,49 @@
+import os
+
+
+def _read(path_):
+    try:
+        with open(path_) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def resolve_device(device):
+    '''
+    Return the ``/dev/videoN`` node behind a ``/dev/v4l/by-id`` link.
+    '''
+    return os.path.realpath(device)
+
+
+def get_video4linux_dir(device, sysfs_root='/sys'):
+    node = resolve_device(device)
+    return os.path.join(sysfs_root, 'class', 'video4linux',
+                        os.path.basename(node))
+
+
+def device_identity(device, sysfs_root='/sys'):
+    '''
+    Return a JSON-serializable dictionary identifying the physical device
+    behind `device`.
+
+    The identity changes when the by-id link points to another node, when
+    the node is re-created (e.g., unplug/replug) or when the card name,
+    bus path or driver reported by sysfs changes.
+    '''
+    node = resolve_device(device)
+    class_dir = get_video4linux_dir(device, sysfs_root)
+    device_dir = os.path.join(class_dir, 'device')
+    driver_dir = os.path.join(device_dir, 'driver')
+    try:
+        mtime = os.stat(node).st_mtime
+    except OSError:
+        mtime = None
+    identity = {'node': node, 'mtime': mtime,
+                'card': _read(os.path.join(class_dir, 'name')),
+                'bus_info': None, 'driver': None}
+    if os.path.exists(device_dir):
+        identity['bus_info'] = os.path.realpath(device_dir)
+    if os.path.exists(driver_dir):
+        identity['driver'] = os.path.basename(os.path.realpath(driver_dir))
+    return identity
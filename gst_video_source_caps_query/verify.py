@@ -0,0 +1,168 @@
+'''
+Measure the frame rate each video mode actually delivers, as opposed to the
+frame rate advertised in its caps.
+
+Each mode is run briefly into a `fakesink`, and the timestamps of the
+buffers reaching it are used to compute the achieved frame rate, the
+inter-frame jitter and the time to the first frame.  Measurements are kept
+in the caps cache, alongside the caps of the device::
+
+    python -m gst_video_source_caps_query.verify --duration 2
+'''
+from __future__ import division
+import json
+import logging
+import sys
+import time
+
+from .formats import get_caps_string, parse_caps_string
+from .pipeline_stats import PipelineStats
+
+
+def measure_mode(video_device, caps_str, device_key, duration=2.,
+                 timeout=5., source_factory=None):
+    '''
+    Run `video_device` in the mode of `caps_str` for `duration` seconds
+    after its first frame (waiting at most `timeout` seconds for it), and
+    return the measured `fps`, `jitter` (in seconds), `time_to_first_frame`
+    (in seconds, `None` if no frame arrived), `frames`, `nominal_fps`,
+    `rate_ratio` and `error` (a bus error message, or `None`).
+    '''
+    from .elements import FilteredInput, gst
+    from .gst_video_source_caps_query import get_video_source_factory
+
+    if source_factory is None:
+        source_factory = get_video_source_factory()
+    framerate = parse_caps_string(caps_str).get('framerate')
+    stats = PipelineStats(framerate[0] / framerate[1] if framerate else None,
+                          window=None)
+    arrivals = []
+
+    def on_buffer(pad, buffer_):
+        arrivals.append(time.time())
+        if buffer_.timestamp != gst.CLOCK_TIME_NONE:
+            # Use the capture timestamps rather than the arrival times,
+            # which include scheduling delays in this process.
+            stats.on_buffer(buffer_.timestamp / gst.SECOND)
+        else:
+            stats.on_buffer(arrivals[-1])
+        return True
+
+    pipeline = gst.Pipeline()
+    video_source = gst.element_factory_make(source_factory, 'video_source')
+    if device_key is not None:
+        video_source.set_property(device_key, video_device)
+    filtered_input = FilteredInput('filtered_input', caps_str, video_source)
+    fake_sink = gst.element_factory_make('fakesink', 'fake_sink')
+    fake_sink.set_property('sync', False)
+    pipeline.add(filtered_input, fake_sink)
+    filtered_input.link(fake_sink)
+    fake_sink.get_pad('sink').add_buffer_probe(on_buffer)
+
+    bus = pipeline.get_bus()
+    error = None
+    start = time.time()
+    try:
+        if pipeline.set_state(gst.STATE_PLAYING) == \
+                gst.STATE_CHANGE_FAILURE:
+            error = 'Unable to start pipeline'
+        while error is None:
+            now = time.time()
+            if arrivals:
+                if now - arrivals[0] >= duration:
+                    break
+            elif now - start >= timeout:
+                error = 'No frame within %.1f s' % timeout
+                break
+            message = bus.timed_pop_filtered(int(.05 * gst.SECOND),
+                                             gst.MESSAGE_ERROR)
+            if message is not None:
+                error = message.parse_error()[0].message
+    finally:
+        pipeline.set_state(gst.STATE_NULL)
+    snapshot = stats.snapshot()
+    return {'fps': snapshot['fps'], 'jitter': snapshot['jitter'],
+            'time_to_first_frame': arrivals[0] - start if arrivals else None,
+            'frames': snapshot['frames'],
+            'nominal_fps': snapshot['nominal_fps'],
+            'rate_ratio': snapshot['rate_ratio'], 'error': error,
+            'duration': duration, 'time': start}
+
+
+def verify_device_modes(video_source_manager, duration=2., timeout=5.,
+                        refresh=False, **kwargs):
+    '''
+    Measure each mode of each device of `video_source_manager` (filtered by
+    `kwargs`, see :meth:`GstVideoSourceManager.iter_device_extracted_caps`),
+    and return a dictionary mapping each device to its modes, each
+    annotated with its measurements (see :func:`measure_mode`) under the
+    `measured` key.
+
+    Measurements are read from, and stored in, the caps cache of the
+    manager, unless `refresh` is `True`.
+    '''
+    cache = video_source_manager.cache
+    device_modes = {}
+    for video_device, video_mode in \
+            video_source_manager.iter_device_extracted_caps(**kwargs):
+        caps_str = get_caps_string(video_mode)
+        identity = video_source_manager.identities.get(video_device)
+        measurement = None
+        if cache is not None and not refresh:
+            measurement = cache.get_measurement(video_device, identity,
+                                                caps_str)
+        if measurement is None:
+            logging.info('measuring %s: %s' % (video_device, caps_str))
+            measurement = measure_mode(
+                    video_device, caps_str, video_source_manager.device_key,
+                    duration=duration, timeout=timeout,
+                    source_factory=getattr(video_source_manager.backend,
+                                           'source_factory', None))
+            if cache is not None:
+                cache.set_measurement(video_device, identity, caps_str,
+                                      measurement)
+        video_mode = dict(video_mode, device=video_device,
+                          measured=measurement)
+        device_modes.setdefault(video_device, []).append(video_mode)
+    if cache is not None:
+        cache.save()
+    return device_modes
+
+
+def parse_args(args=None):
+    """Parses verification arguments."""
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Measures the frame rate achieved '
+                            'by each video mode.')
+    parser.add_argument('--duration', type=float, default=2.,
+                        help='seconds to run each mode for '
+                        '(default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=5.,
+                        help='seconds to wait for the first frame of a mode '
+                        '(default: %(default)s)')
+    parser.add_argument('--format', dest='format_', help='video format')
+    parser.add_argument('--refresh', action='store_true',
+                        help='measure modes even if cached measurements are '
+                        'available')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    from .gst_video_source_caps_query import GstVideoSourceManager
+
+    args = parse_args(args)
+    device_modes = verify_device_modes(GstVideoSourceManager(),
+                                       duration=args.duration,
+                                       timeout=args.timeout,
+                                       refresh=args.refresh,
+                                       format_=args.format_)
+    for video_device, video_modes in sorted(device_modes.items()):
+        for video_mode in video_modes:
+            sys.stdout.write(json.dumps({
+                    'device': video_device, 'caps': get_caps_string(video_mode),
+                    'measured': video_mode['measured']}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 from __future__ import division
 from pprint import pprint, pformat
-from multiprocessing import Process, Pipe
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import Process, Pipe, TimeoutError
+import itertools
+import Queue
+import threading
 import time
 import logging
 
@@ -12,8 +17,16 @@ except:
 finally:
     import gst
 import glib
-from gst_video_source_caps_query import GstVideoSourceManager, FilteredInput,\
+from gst_video_source_caps_query import GstVideoSourceManager,\
         get_available_video_modes, get_video_source_configs, DeviceNotFound
+from .async_result import AsyncResult
+from .conversion import get_output_caps_string, plan_conversions
+from .elements import DELIVERY_POLICIES, FanOut, FilteredInput
+from .formats import Fps, get_caps_string, parse_caps_string
+from .frame_ring import FrameExport, FrameRing
+from .mode_table import ModeTable
+from .pipeline_stats import PipelineStats
+from .ranking import ModeRanker, select_best_video_caps
 from pygtkhelpers.ui.extra_widgets import Enum, Form
 from pygtkhelpers.ui.form_view_dialog import FormViewDialog, create_form_view
 from pygtkhelpers.ui.extra_dialogs import field_entry_dialog
@@ -21,19 +34,17 @@ from pygtkhelpers.ui.extra_dialogs import field_entry_dialog
 
 def get_video_mode_form(video_modes=None):
     if video_modes is None:
-        video_modes = get_available_video_modes(
-                format_='YUY2')
+        video_modes = get_available_video_modes()
     video_mode_map = get_video_mode_map(video_modes)
     video_keys = sorted(video_mode_map.keys())
-    form = Form.of(Enum.named('video_mode').valued(
-            *video_keys).using(default=video_keys[0]))
+    form = Form.of(Enum.named('video_mode').valued(*video_keys).using(
+            default=get_default_video_key(video_mode_map)))
     return form
 
 
 def get_video_mode_enum(video_modes=None):
     if video_modes is None:
-        video_modes = get_available_video_modes(
-                format_='YUY2')
+        video_modes = get_available_video_modes()
     video_mode_map = get_video_mode_map(video_modes)
     video_keys = sorted(video_mode_map.keys())
     return Enum.named('video_mode').valued(*video_keys)
@@ -48,11 +59,23 @@ def get_video_mode_map(video_modes):
     return video_mode_map
 
 
+def get_default_video_key(video_mode_map):
+    '''
+    Return the key of the best-ranked mode in `video_mode_map` (see
+    :class:`ModeRanker`), by measured frame rate where available.
+    '''
+    ranked = ModeRanker(use_measured=True).rank(video_mode_map.itervalues())
+    best_mode = ranked[0][1]
+    for key, video_mode in video_mode_map.iteritems():
+        if video_mode is best_mode:
+            return key
+
+
 def select_video_mode(video_modes):
     video_mode_map = get_video_mode_map(video_modes)
-    video_keys = sorted(video_mode_map.keys())
     enum = get_video_mode_enum(video_modes)
-    valid, response = field_entry_dialog(enum.using(default=video_keys[0]))
+    valid, response = field_entry_dialog(enum.using(
+            default=get_default_video_key(video_mode_map)))
     try:
         if valid:
             return video_mode_map[response]
@@ -60,8 +83,12 @@ def select_video_mode(video_modes):
         raise ValueError, 'No video mode matching: %s' % response
 
 
-def select_video_caps():
-    video_modes = get_available_video_modes(format_='YUY2')
+def select_video_caps(video_source_manager=None):
+    '''
+    Prompt for one of the modes available to `video_source_manager`,
+    defaulting to the best-ranked (see :class:`ModeRanker`).
+    '''
+    video_modes = get_available_video_modes(video_source_manager)
     selected_mode = select_video_mode(video_modes)
     if selected_mode:
         return selected_mode['device'], GstVideoSourceManager.get_caps_string(selected_mode)
@@ -71,12 +98,11 @@ def select_video_caps():
 
 def get_video_mode_form(video_modes=None):
     if video_modes is None:
-        video_modes = get_available_video_modes(
-                format_='YUY2')
+        video_modes = get_available_video_modes()
     video_mode_map = get_video_mode_map(video_modes)
     video_keys = sorted(video_mode_map.keys())
-    form = Form.of(Enum.named('video_mode').valued(
-            *video_keys).using(default=video_keys[0]))
+    form = Form.of(Enum.named('video_mode').valued(*video_keys).using(
+            default=get_default_video_key(video_mode_map)))
     return form
 
 
@@ -94,16 +120,64 @@ def select_video_source():
     return create_video_source(device, caps_str)
 
 
-def create_video_source(device, caps_str):
+def plan_output(device, caps_str, output, video_modes=None):
+    '''
+    Return the cheapest :class:`conversion.ConversionPlan` producing
+    `output` (see :func:`plan_conversions`) among the modes of `device` in
+    `video_modes` (by default, only the mode of `caps_str`), or raise
+    `ValueError`.
+    '''
+    if video_modes is None:
+        video_mode = parse_caps_string(caps_str)
+        video_mode['framerate'] = Fps(*video_mode['framerate'])
+        video_modes = [video_mode]
+    else:
+        video_modes = [m for m in video_modes
+                       if m.get('device', device) == device]
+    plans = plan_conversions(video_modes, **output)
+    if not plans:
+        raise ValueError, 'No mode of device %s can produce %s' % (
+                device, get_output_caps_string(output))
+    for plan in plans:
+        logging.debug('conversion cost %.1f (%s): %s' % (
+                plan.cost, ', '.join(plan.steps) or 'native',
+                get_caps_string(plan.video_mode)))
+    return plans[0]
+
+
+def create_video_source(device, caps_str, device_key=None,
+                        delivery_policy=None, depth=1, output=None,
+                        video_modes=None):
+    '''
+    Pass `device_key` (see :func:`get_video_source_configs`) to skip
+    listing the available devices.
+
+    See :class:`FilteredInput` for `delivery_policy` and `depth`.
+
+    If `output` is set to a dictionary with the `width`, `height` and,
+    optionally, `fourcc` and `framerate` of the frames needed, the source
+    mode is chosen as the cheapest to convert (see
+    :func:`plan_conversions`) among the modes of `device` in `video_modes`
+    (by default, only the mode of `caps_str`), and the conversion elements
+    required, if any, are added.
+    '''
+    conversion_plan = None
+    if output is not None:
+        conversion_plan = plan_output(device, caps_str, output, video_modes)
+        caps_str = get_caps_string(conversion_plan.video_mode)
     if device is None:
         # Assume blank video test src
         video_source = gst.element_factory_make('videotestsrc', 'video_source')
         video_source.set_property('pattern', 2)
     else:
         video_source = GstVideoSourceManager.get_video_source()
-        device_key, devices = get_video_source_configs()
+        if device_key is None:
+            device_key, devices = get_video_source_configs()
         video_source.set_property(device_key, device)
-    filtered_input = FilteredInput('filtered_input', caps_str, video_source)
+    filtered_input = FilteredInput('filtered_input', caps_str, video_source,
+                                   delivery_policy=delivery_policy,
+                                   depth=depth,
+                                   conversion_plan=conversion_plan)
     return filtered_input
 
 
@@ -117,9 +191,23 @@ def test_pipeline():
     glib.MainLoop().run()
 
 
-def get_pipeline(video_source=None):
+def get_app_sink(max_buffers=1, drop=True, name='video_sink'):
+    '''
+    Return an `appsink` emitting a `new-buffer` signal for each frame,
+    keeping at most `max_buffers` frames queued.
+    '''
+    app_sink = gst.element_factory_make('appsink', name)
+    app_sink.set_property('emit-signals', True)
+    app_sink.set_property('sync', False)
+    app_sink.set_property('max-buffers', max_buffers)
+    app_sink.set_property('drop', drop)
+    return app_sink
+
+
+def get_pipeline(video_source=None, video_sink=None):
     pipeline = gst.Pipeline()
-    video_sink = gst.element_factory_make('autovideosink', 'video_sink')
+    if video_sink is None:
+        video_sink = gst.element_factory_make('autovideosink', 'video_sink')
     if video_source is None:
         video_source = select_video_source()
     pipeline.add(video_sink, video_source)
@@ -127,7 +215,40 @@ def get_pipeline(video_source=None):
     return pipeline
 
 
+DEFAULT_PIPELINE = 'default'
+
+# Parent ends of the pipes of the running workers.  Each worker closes its
+# inherited copies, so that it sees EOF once the parent closes its end (or
+# exits).
+_master_pipes = set()
+
+
+def get_branch_key(pipeline, branch):
+    '''
+    Key of the frame export of a fan-out branch (see :class:`FanOut`).
+    '''
+    return '%s/%s' % (pipeline, branch)
+
+
+def get_delivery_config(delivery_policy, depth=1):
+    if delivery_policy is None:
+        return None
+    if delivery_policy not in DELIVERY_POLICIES:
+        raise ValueError, 'Unknown delivery policy: %s' % delivery_policy
+    return {'delivery_policy': delivery_policy, 'depth': depth}
+
+
 class _GStreamerProcess(Process):
+    '''
+    Worker process hosting any number of named capture pipelines.
+
+    Pipeline commands (`create`, `start`, `stop`, `reset`, `status`,
+    `stats`, `subscribe_stats`, `attach`, `detach`) are addressed by the
+    `pipeline` field of the request, which defaults to `DEFAULT_PIPELINE`.
+
+    A pipeline created with `fan_out` feeds its source to branches added
+    and removed with `attach` and `detach` (see :class:`FanOut`).
+    '''
     def __init__(self, *args, **kwargs):
         super(_GStreamerProcess, self).__init__(*args, **kwargs)
     
@@ -136,108 +257,678 @@ class _GStreamerProcess(Process):
         return super(_GStreamerProcess, self).start()
 
     def run(self):
-        self.pipeline = None
-        self._check_count = 0
+        for master_pipe in _master_pipes:
+            master_pipe.close()
+        self.pipelines = {}
+        self.video_caps = {}
+        self.video_sources = {}
+        self.frame_rings = {}
+        self.fan_outs = {}
+        self.pipeline_stats = {}
+        # Created on demand, and kept to reuse probed capabilities.
+        self._video_source_manager = None
+        # `glib` timeout source IDs of periodic stats pushes.
+        self.stats_subscriptions = {}
+        # Frame events are sent from streaming threads.
+        self._send_lock = threading.Lock()
+        # Resolve the device configuration once, rather than on each
+        # `create`.
+        try:
+            self.device_key, devices = get_video_source_configs()
+        except DeviceNotFound:
+            self.device_key = None
         self._main_loop = glib.MainLoop()
-        glib.timeout_add(500, self._update_state)
+        # Service requests as soon as they arrive, rather than polling.
+        glib.io_add_watch(self._pipe.fileno(), glib.IO_IN | glib.IO_HUP,
+                          self._on_pipe_ready)
         try:
             self._main_loop.run()
         except DeviceNotFound:
             self._finish()
 
+    def _on_pipe_ready(self, fd, condition):
+        return self._update_state()
+
     def _finish(self):
-        self._cleanup_pipeline()
+        for name in self.pipelines.keys():
+            self._cleanup_pipeline(name)
         self._main_loop.quit()
 
-    def _cleanup_pipeline(self):
-        if self.pipeline:
-            del self.pipeline
-            self.pipeline = None
+    def _cleanup_pipeline(self, name):
+        self._unsubscribe_stats(name)
+        pipeline = self.pipelines.pop(name, None)
+        self.video_caps.pop(name, None)
+        self.video_sources.pop(name, None)
+        self.fan_outs.pop(name, None)
+        self.pipeline_stats.pop(name, None)
+        if pipeline is not None:
+            pipeline.set_state(gst.STATE_NULL)
+            pipeline.get_bus().remove_signal_watch()
+            del pipeline
+        for key in self.frame_rings.keys():
+            if key == name or key.startswith(get_branch_key(name, '')):
+                self.frame_rings.pop(key).close()
+
+    def _get_export_sink(self, key, export, delivery, name='video_sink'):
+        '''
+        Return an `appsink` writing frames into the ring shared with the
+        parent, announced as events for `key`.
+        '''
+        self.frame_rings[key] = FrameRing(export['path'], export['slot_size'],
+                                          export['slot_count'])
+        # With a delivery policy, frames are dropped (or the source blocked)
+        # by the delivery queue rather than by the sink.
+        app_sink = get_app_sink(drop=not delivery, name=name)
+        app_sink.connect('new-buffer', self._on_new_buffer, key)
+        return app_sink
+
+    def _on_new_buffer(self, app_sink, key):
+        buffer_ = app_sink.emit('pull-buffer')
+        frame_ring = self.frame_rings.get(key)
+        if buffer_ is None or frame_ring is None:
+            return
+        try:
+            slot, sequence = frame_ring.write(buffer_.data)
+        except ValueError:
+            logging.warning('dropping oversized frame (%s)' % key)
+            return
+        self._send({'event': 'frame', 'pipeline': key, 'slot': slot,
+                    'sequence': sequence, 'size': len(buffer_.data),
+                    'timestamp': buffer_.timestamp})
+
+    def _watch_pipeline(self, name, caps_str):
+        '''
+        Collect statistics for pipeline `name` from a probe on the filtered
+        source pad and from the pipeline bus.
+        '''
+        framerate = parse_caps_string(caps_str).get('framerate')
+        nominal_fps = framerate[0] / framerate[1] if framerate else None
+        self.pipeline_stats[name] = PipelineStats(nominal_fps)
+        # Probe ahead of the delivery queue, to measure the rate of the
+        # source itself rather than that of the consumer.
+        caps_filter = self.video_sources[name].caps_filter
+        caps_filter.get_pad('src').add_buffer_probe(self._on_source_buffer,
+                                                    name)
+        bus = self.pipelines[name].get_bus()
+        bus.add_signal_watch()
+        bus.connect('message', self._on_bus_message, name)
+
+    def _on_source_buffer(self, pad, buffer_, name):
+        stats = self.pipeline_stats.get(name)
+        if stats is not None:
+            stats.on_buffer()
+            if stats.negotiated_caps is None:
+                caps = pad.get_negotiated_caps()
+                if caps is not None:
+                    stats.negotiated_caps = caps.to_string()
+        return True
+
+    def _on_bus_message(self, bus, message, name):
+        stats = self.pipeline_stats.get(name)
+        if stats is None:
+            return
+        if message.type == gst.MESSAGE_ERROR:
+            error, debug = message.parse_error()
+            logging.error('[%s] %s (%s)' % (name, error.message, debug))
+            stats.on_error(error.message)
+        elif message.type == gst.MESSAGE_WARNING:
+            warning, debug = message.parse_warning()
+            logging.warning('[%s] %s (%s)' % (name, warning.message, debug))
+            stats.on_warning(warning.message)
+        elif (message.type == gst.MESSAGE_STATE_CHANGED and
+              message.src == self.pipelines.get(name)):
+            old_state, new_state, pending = message.parse_state_changed()
+            stats.on_state_changed(new_state.value_nick)
+
+    def _set_state(self, name, state):
+        self.pipeline_stats[name].on_state_requested()
+        return self.pipelines[name].set_state(state)
+
+    def _get_stats(self, name):
+        result = self.pipeline_stats[name].snapshot()
+        result.update(self._pipeline_status(name))
+        return result
+
+    def _push_stats(self, name):
+        if name not in self.pipelines:
+            return False
+        self._send({'event': 'stats', 'pipeline': name,
+                    'stats': self._get_stats(name)})
+        return True
+
+    def _unsubscribe_stats(self, name):
+        source_id = self.stats_subscriptions.pop(name, None)
+        if source_id is not None:
+            glib.source_remove(source_id)
+
+    def _get_video_source_manager(self):
+        if self._video_source_manager is None:
+            self._video_source_manager = GstVideoSourceManager()
+        return self._video_source_manager
+
+    def _pipeline_status(self, name):
+        result, state, pending = self.pipelines[name].get_state(0)
+        fan_out = self.fan_outs.get(name)
+        conversion_plan = self.video_sources[name].conversion_plan
+        if conversion_plan is not None:
+            conversion = {'steps': list(conversion_plan.steps),
+                          'cost': conversion_plan.cost,
+                          'output_caps': conversion_plan.output_caps}
+        else:
+            conversion = None
+        return {'state': state.value_nick, 'pending': pending.value_nick,
+                'video_caps': self.video_caps[name],
+                'delivery': self.video_sources[name].get_delivery_stats(),
+                'branches': sorted(fan_out.branches) if fan_out else None,
+                'conversion': conversion}
 
     def _process_request(self, request):
+        name = request.get('pipeline', DEFAULT_PIPELINE)
+        pipeline = self.pipelines.get(name)
         if request['command'] == 'create':
             '''
             Create a pipeline
             '''
-            if self.pipeline is None:
-                device, caps_str = request['video_caps']
-                print '''{'device': %s, 'caps_str': %s}''' % (device, caps_str)
-                video_source = create_video_source(device, caps_str)
-                self.pipeline = get_pipeline(video_source)
+            if pipeline is not None:
+                raise ValueError, 'Pipeline %s already exists' % name
+            device, caps_str = request['video_caps']
+            print '''{'pipeline': %s, 'device': %s, 'caps_str': %s}''' % (
+                    name, device, caps_str)
+            delivery = request.get('delivery') or {}
+            output = request.get('output')
+            video_modes = None
+            if output is not None and caps_str is None:
+                # Choose among all the modes of the device.
+                video_modes = get_available_video_modes(
+                        self._get_video_source_manager())
+            video_source = create_video_source(device, caps_str,
+                                               device_key=self.device_key,
+                                               output=output,
+                                               video_modes=video_modes,
+                                               **delivery)
+            if video_source.conversion_plan is not None:
+                caps_str = get_caps_string(
+                        video_source.conversion_plan.video_mode)
+            self.video_sources[name] = video_source
+            export = request.get('export')
+            if request.get('fan_out', False):
+                self.pipelines[name] = gst.Pipeline()
+                self.fan_outs[name] = FanOut(self.pipelines[name],
+                                             video_source)
+            elif export is None:
+                self.pipelines[name] = get_pipeline(video_source)
+            else:
+                app_sink = self._get_export_sink(name, export, delivery)
+                self.pipelines[name] = get_pipeline(video_source, app_sink)
+            self.video_caps[name] = device, caps_str
+            self._watch_pipeline(name, caps_str)
+            return True
         elif request['command'] == 'start':
-            if self.pipeline:
-                result = self.pipeline.set_state(gst.STATE_PLAYING)
+            if pipeline:
+                result = self._set_state(name, gst.STATE_PLAYING)
                 return (result != gst.STATE_CHANGE_FAILURE)
         elif request['command'] == 'stop':
-            if self.pipeline:
-                self.pipeline.set_state(gst.STATE_NULL)
+            if pipeline:
+                self._set_state(name, gst.STATE_NULL)
+        elif request['command'] in ('attach', 'detach'):
+            fan_out = self.fan_outs.get(name)
+            if fan_out is None:
+                raise ValueError, 'Pipeline %s has no fan-out' % name
+            branch = request['branch']
+            key = get_branch_key(name, branch)
+            if request['command'] == 'detach':
+                fan_out.detach(branch)
+                frame_ring = self.frame_rings.pop(key, None)
+                if frame_ring is not None:
+                    frame_ring.close()
+                return True
+            delivery = request.get('delivery') or {}
+            sink_name = '%s_%s_sink' % (fan_out.name, branch)
+            if request.get('export') is not None:
+                video_sink = self._get_export_sink(key, request['export'],
+                                                   delivery, name=sink_name)
+            else:
+                video_sink = gst.element_factory_make(request['sink'],
+                                                      sink_name)
+                for k, v in request.get('sink_properties', {}).iteritems():
+                    video_sink.set_property(k, v)
+            fan_out.attach(branch, video_sink, **delivery)
+            return True
         elif request['command'] == 'reset':
-            self._cleanup_pipeline()
+            self._cleanup_pipeline(name)
+        elif request['command'] == 'reset_all':
+            for name in self.pipelines.keys():
+                self._cleanup_pipeline(name)
+        elif request['command'] == 'ping':
+            return True
+        elif request['command'] == 'status':
+            if 'pipeline' in request:
+                return self._pipeline_status(name) if pipeline else None
+            return dict([(n, self._pipeline_status(n))
+                         for n in self.pipelines])
+        elif request['command'] == 'stats':
+            if 'pipeline' in request:
+                return self._get_stats(name) if pipeline else None
+            return dict([(n, self._get_stats(n)) for n in self.pipelines])
+        elif request['command'] == 'subscribe_stats':
+            if pipeline is None:
+                raise ValueError, 'No pipeline %s' % name
+            self._unsubscribe_stats(name)
+            interval = request.get('interval')
+            if interval:
+                self.stats_subscriptions[name] = glib.timeout_add(
+                        int(interval * 1000), self._push_stats, name)
+            return True
         elif request['command'] == 'finish':
             self._finish()
             raise SystemExit
         elif request['command'] == 'select_video_caps':
-            result = select_video_caps()
+            result = select_video_caps(self._get_video_source_manager())
             return result
+        elif request['command'] == 'select_best_video_caps':
+            return select_best_video_caps(
+                    video_source_manager=self._get_video_source_manager(),
+                    **request['kwargs'])
         elif request['command'] == 'get_available_video_modes':
-            result = get_available_video_modes(**request['kwargs'])
+            result = get_available_video_modes(
+                    self._get_video_source_manager(), **request['kwargs'])
+            if request.get('compact', False):
+                return ModeTable.from_video_modes(result).encode()
             return result
 
+    def _send(self, message):
+        with self._send_lock:
+            self._pipe.send(message)
+
+    def _respond(self, request, response):
+        if request.get('ack', False):
+            response['id'] = request.get('id')
+            self._send(response)
+
     def _update_state(self):
         while self._pipe.poll():
-            request = self._pipe.recv()
+            try:
+                request = self._pipe.recv()
+            except (EOFError, IOError):
+                # The parent process has gone away.
+                self._finish()
+                return False
             logging.debug('  [request] {}'.format(request))
             try:
                 result = self._process_request(request)
-                if request.get('ack', False):
-                    self._pipe.send({'result': result})
-            except DeviceNotFound:
-                if request.get('ack', False):
-                    self._pipe.send({'result': None, 'error': True})
+                self._respond(request, {'result': result})
             except SystemExit:
                 return False
+            except Exception, why:
+                if not isinstance(why, DeviceNotFound):
+                    logging.error('error processing request %s' % request,
+                                  exc_info=True)
+                self._respond(request, {'result': None, 'error': True,
+                                        'error_type': why.__class__.__name__,
+                                        'message': str(why)})
         return True
 
 
 class GStreamerProcess(object):
+    '''
+    Client for a GStreamer worker process.
+
+    Each acknowledged command is tagged with a request ID and
+    :meth:`request` returns an :class:`AsyncResult`, so several commands
+    may be in flight at once.  Responses are read by a background thread,
+    and events (e.g., frames) are handled by another.  The blocking methods
+    (e.g., :meth:`start`) wait on the same results.
+    '''
     child_class = _GStreamerProcess
+    # Seconds to wait for the response to a pipeline command before raising
+    # `multiprocessing.TimeoutError` (`None` to wait indefinitely).
+    command_timeout = None
+    # Seconds to wait for the worker to probe the devices (see
+    # `plan_output`).
+    probe_timeout = None
 
     def __init__(self):
         self.master_pipe, self.worker_pipe = Pipe()
+        _master_pipes.add(self.master_pipe)
         self._process = self.child_class(args=(self.worker_pipe, ))
         self._process.start(self.worker_pipe)
+        # Only the child uses the worker end; closing it here lets the
+        # receiver thread see EOF if the child exits.
+        self.worker_pipe.close()
         self._finished = False
+        self._request_ids = itertools.count()
+        self._pending = {}
+        # Event handlers by `(event, pipeline name)`, called from the event
+        # thread, so that a slow handler (e.g., a frame callback) does not
+        # delay responses (e.g., to heartbeats).
+        self._event_handlers = {}
+        self._events = Queue.Queue()
+        # Frame exports by pipeline name, or by branch key (see
+        # `get_branch_key`) for fan-out branches.
+        self.frame_exports = {}
+        # Video caps, and caps of the converted frames of pipelines created
+        # with an `output`, by pipeline name.
+        self.video_caps = {}
+        self.output_caps = {}
+        self._lock = threading.Lock()
+        self._receiver = threading.Thread(target=self._receive_responses,
+                                          name='GStreamerProcessReceiver')
+        self._receiver.daemon = True
+        self._receiver.start()
+        self._event_thread = threading.Thread(target=self._dispatch_events,
+                                              name='GStreamerProcessEvents')
+        self._event_thread.daemon = True
+        self._event_thread.start()
+
+    def _dispatch_events(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            handler = self._event_handlers.get((event['event'],
+                                                event.get('pipeline')))
+            if handler is not None:
+                try:
+                    handler(event)
+                except Exception:
+                    logging.error('error handling event', exc_info=True)
+
+    def _receive_responses(self):
+        while True:
+            try:
+                response = self.master_pipe.recv()
+            except (EOFError, IOError):
+                break
+            if 'event' in response:
+                self._events.put(response)
+                continue
+            with self._lock:
+                async_result = self._pending.pop(response.get('id'), None)
+            if async_result is None:
+                logging.warning('unexpected response: %s' % response)
+            elif response.get('error', False):
+                if response.get('error_type') == 'DeviceNotFound':
+                    exception = DeviceNotFound(response['message'])
+                else:
+                    exception = RuntimeError(response['message'])
+                async_result.set_exception(exception)
+            else:
+                async_result.set_result(response['result'])
+        # The worker has exited; stop the event thread once it has handled
+        # the pending events, and fail any request still waiting.
+        self._events.put(None)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for async_result in pending.values():
+            async_result.set_exception(RuntimeError('GStreamer process '
+                                                    'exited'))
+
+    def request(self, command, **kwargs):
+        '''
+        Send `command` to the worker and return an :class:`AsyncResult`
+        for its result.
+        '''
+        async_result = AsyncResult()
+        request = dict(kwargs, command=command, ack=True)
+        with self._lock:
+            request['id'] = next(self._request_ids)
+            self._pending[request['id']] = async_result
+            self.master_pipe.send(request)
+        return async_result
+
+    def send(self, command, **kwargs):
+        '''
+        Send `command` to the worker without waiting for a response.
+        '''
+        with self._lock:
+            self.master_pipe.send(dict(kwargs, command=command))
 
     def select_video_caps(self):
-        self.master_pipe.send({'command': 'select_video_caps',
-                'ack': True})
         # Wait for result so we block until video caps have been
         # selected
-        response = self.master_pipe.recv()
-        if response.get('error', False):
+        try:
+            return self.request('select_video_caps').get()
+        except DeviceNotFound:
+            raise DeviceNotFound, 'No devices/video modes available'
+
+    def select_best_video_caps(self, **kwargs):
+        '''
+        Return `(device, caps_str)` of the best mode available to the
+        worker, ranked by a :class:`ModeRanker` constructed with `kwargs`,
+        without prompting.
+        '''
+        result = self.request('select_best_video_caps', kwargs=kwargs).get()
+        if result is None:
             raise DeviceNotFound, 'No devices/video modes available'
-        return response['result']
+        return result
+
+    def create(self, video_caps, pipeline=DEFAULT_PIPELINE,
+               delivery_policy=None, depth=1, fan_out=False, output=None):
+        '''
+        Create `pipeline`, delivering frames according to `delivery_policy`
+        (see :func:`get_delivery_queue`), if set.
+
+        If `output` is set, frames are converted as needed to the requested
+        output (see :meth:`plan_output`); the caps string of `video_caps`
+        may then be `None` to choose the cheapest mode of the device.
+
+        If `fan_out` is `True`, frames are not displayed; instead, any number
+        of branches can be attached (see :meth:`attach_branch`) to share the
+        device.
+        '''
+        output_caps = None
+        if output is not None:
+            plan = self.plan_output(video_caps, output)
+            video_caps = video_caps[0], get_caps_string(plan.video_mode)
+            output_caps = plan.output_caps
+        # Wait for the worker, so that errors (e.g., a duplicate pipeline
+        # name) are raised here.
+        self.request('create', video_caps=video_caps, pipeline=pipeline,
+                     delivery=get_delivery_config(delivery_policy, depth),
+                     fan_out=fan_out,
+                     output=output).get(self.command_timeout)
+        self.video_caps[pipeline] = video_caps
+        if output_caps is not None:
+            self.output_caps[pipeline] = output_caps
+
+    def plan_output(self, video_caps, output):
+        '''
+        Return the :class:`conversion.ConversionPlan` producing `output`
+        from the mode of `video_caps`, or, if its caps string is `None`,
+        from the cheapest of the modes of its device available to the
+        worker (waiting up to `probe_timeout` seconds for them).
+
+        The plan is resolved here, rather than by the worker, so that the
+        output caps (e.g., the format of a native RGB mode) are known
+        before any frame is exported.
+        '''
+        device, caps_str = video_caps
+        video_modes = None
+        if caps_str is None:
+            video_modes = self.request('get_available_video_modes',
+                                       kwargs={}).get(self.probe_timeout)
+        return plan_output(device, caps_str, output, video_modes)
+
+    def attach_branch(self, branch, sink='autovideosink',
+                      pipeline=DEFAULT_PIPELINE, delivery_policy='drop-oldest',
+                      depth=4, **sink_properties):
+        '''
+        Attach a `sink` element (by factory name, with `sink_properties`) as
+        branch `branch` of fan-out `pipeline`, while it is running.
+        '''
+        return self.request('attach', pipeline=pipeline, branch=branch,
+                            sink=sink, sink_properties=sink_properties,
+                            delivery=get_delivery_config(delivery_policy,
+                                                         depth)).get(self.command_timeout)
+
+    def attach_frame_export(self, branch, pipeline=DEFAULT_PIPELINE,
+                            slot_count=4, callback=None,
+                            delivery_policy='keep-latest', depth=1,
+                            frame_export=None):
+        '''
+        Attach a branch to fan-out `pipeline` exporting frames to this
+        process (see :meth:`create_frame_export`) and return its
+        :class:`FrameExport`.
+        '''
+        if pipeline in self.output_caps:
+            caps_str = self.output_caps[pipeline]
+        else:
+            device, caps_str = self.video_caps[pipeline]
+        key = get_branch_key(pipeline, branch)
+        created = frame_export is None
+        if created:
+            frame_export = FrameExport(caps_str, slot_count=slot_count,
+                                       callback=callback)
+        self.frame_exports[key] = frame_export
+        self._event_handlers[('frame', key)] = frame_export.on_frame
+        try:
+            self.request('attach', pipeline=pipeline, branch=branch,
+                         export=frame_export.config,
+                         delivery=get_delivery_config(delivery_policy,
+                                                      depth)).get(self.command_timeout)
+        except Exception:
+            if created:
+                self._close_frame_export(key)
+            else:
+                # Left open for reuse by the caller.
+                self._event_handlers.pop(('frame', key), None)
+                self.frame_exports.pop(key, None)
+            raise
+        return frame_export
 
-    def create(self, video_caps):
-        self.master_pipe.send({'command': 'create', 'video_caps': video_caps})
+    def detach_branch(self, branch, pipeline=DEFAULT_PIPELINE):
+        self.request('detach', pipeline=pipeline, branch=branch).get(self.command_timeout)
+        self._close_frame_export(get_branch_key(pipeline, branch))
 
-    def start(self):
+    def start(self, pipeline=DEFAULT_PIPELINE):
         logging.debug('sending START')
-        self.master_pipe.send({'command': 'start', 'ack': True})
-        response = self.master_pipe.recv()
-        if not response['result']:
+        if not self.request('start', pipeline=pipeline).get(self.command_timeout):
             raise RuntimeError, 'Unable to start pipeline.  Is device already in use?'
 
-    def stop(self, block=True):
+    def stop(self, block=True, pipeline=DEFAULT_PIPELINE):
         logging.debug('sending STOP')
-        self.master_pipe.send({'command': 'stop', 'ack': block})
         if block:
-            response = self.master_pipe.recv()
+            self.request('stop', pipeline=pipeline).get(self.command_timeout)
+        else:
+            self.send('stop', pipeline=pipeline)
 
-    def reset(self, block=True):
-        self.master_pipe.send({'command': 'reset', 'ack': block})
+    def create_frame_export(self, video_caps, pipeline=DEFAULT_PIPELINE,
+                            slot_count=4, callback=None,
+                            delivery_policy='keep-latest', depth=1,
+                            output=None, frame_export=None):
+        '''
+        Create a pipeline whose frames are exported to this process through
+        a shared-memory ring, instead of being displayed.
+
+        Returns a :class:`FrameExport`; `callback(frame)` is called from the
+        event thread with a zero-copy view of each frame, and the latest
+        frame is available as the `latest` attribute.
+
+        Frames the event thread cannot keep up with are handled according
+        to `delivery_policy` (see :func:`get_delivery_queue`).
+
+        Pass an existing `frame_export` (e.g., from a worker that died) to
+        keep delivering frames through it.
+        '''
+        device, caps_str = video_caps
+        if output is not None:
+            plan = self.plan_output(video_caps, output)
+            video_caps = device, get_caps_string(plan.video_mode)
+            caps_str = plan.output_caps
+        created = frame_export is None
+        if created:
+            frame_export = FrameExport(caps_str, slot_count=slot_count,
+                                       callback=callback)
+        try:
+            self.request('create', video_caps=video_caps, pipeline=pipeline,
+                         export=frame_export.config,
+                         delivery=get_delivery_config(delivery_policy, depth),
+                         output=output).get(self.command_timeout)
+        except Exception:
+            if created:
+                frame_export.close()
+            raise
+        self.video_caps[pipeline] = video_caps
+        if output is not None:
+            self.output_caps[pipeline] = caps_str
+        self.frame_exports[pipeline] = frame_export
+        self._event_handlers[('frame', pipeline)] = frame_export.on_frame
+        return frame_export
+
+    def _close_frame_export(self, key):
+        self._event_handlers.pop(('frame', key), None)
+        frame_export = self.frame_exports.pop(key, None)
+        if frame_export is not None:
+            frame_export.close()
+
+    def _forget_pipeline(self, pipeline):
+        self.video_caps.pop(pipeline, None)
+        self.output_caps.pop(pipeline, None)
+        self._event_handlers.pop(('stats', pipeline), None)
+        for key in self.frame_exports.keys():
+            if (key == pipeline or
+                    key.startswith(get_branch_key(pipeline, ''))):
+                self._close_frame_export(key)
+
+    def reset(self, block=True, pipeline=DEFAULT_PIPELINE):
         if block:
-            response = self.master_pipe.recv()
+            self.request('reset', pipeline=pipeline).get(self.command_timeout)
+        else:
+            self.send('reset', pipeline=pipeline)
+        self._forget_pipeline(pipeline)
+
+    def reset_all(self):
+        self.request('reset_all').get(self.command_timeout)
+        for key in self.frame_exports.keys():
+            self._close_frame_export(key)
+        self._event_handlers.clear()
+        self.video_caps.clear()
+        self.output_caps.clear()
+
+    def ping(self, timeout=None):
+        '''
+        Wait until the worker is servicing requests.
+        '''
+        return self.request('ping').get(timeout)
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def status(self, pipeline=None):
+        '''
+        Return the state and video caps of `pipeline`, or a dictionary
+        mapping each pipeline name to its status if `pipeline` is `None`.
+        '''
+        if pipeline is None:
+            return self.request('status').get(self.command_timeout)
+        return self.request('status', pipeline=pipeline).get(self.command_timeout)
+
+    def stats(self, pipeline=None):
+        '''
+        Return a snapshot of the statistics of `pipeline` (throughput,
+        jitter, state-change latency, negotiated caps, bus errors and
+        warnings, and frame delivery), or a dictionary mapping each pipeline
+        name to its statistics if `pipeline` is `None`.
+        '''
+        if pipeline is None:
+            return self.request('stats').get(self.command_timeout)
+        return self.request('stats', pipeline=pipeline).get(self.command_timeout)
+
+    def subscribe_stats(self, callback, interval=1.,
+                        pipeline=DEFAULT_PIPELINE):
+        '''
+        Call `callback(stats)` from the event thread with a snapshot of
+        the statistics of `pipeline` every `interval` seconds.
+        '''
+        self._event_handlers[('stats', pipeline)] = \
+                lambda event: callback(event['stats'])
+        return self.request('subscribe_stats', pipeline=pipeline,
+                            interval=interval).get(self.command_timeout)
+
+    def unsubscribe_stats(self, pipeline=DEFAULT_PIPELINE):
+        self.request('subscribe_stats', pipeline=pipeline,
+                     interval=None).get(self.command_timeout)
+        self._event_handlers.pop(('stats', pipeline), None)
 
     def run(self, sleep_duration=1.5):
         video_caps = self.select_video_caps()
@@ -250,46 +941,427 @@ class GStreamerProcess(object):
 
     def finish(self):
         logging.debug('sending FINISH')
-        self.master_pipe.send({'command': 'finish'})
+        self.send('finish')
         self._finished = True
 
     def join(self):
-        if not self._finished:
+        if not self._finished and self.is_alive():
             self.finish()
         if self._process:
             self._process.join()
             self._process = None
+        self._close_master_pipe()
+        for key in self.frame_exports.keys():
+            self._close_frame_export(key)
 
-    def get_available_video_modes(self, **kwargs):
-        self.master_pipe.send({'command': 'get_available_video_modes',
-                'kwargs': kwargs, 'ack': True})
-        response = self.master_pipe.recv()
-        return response['result']
+    def _close_master_pipe(self):
+        _master_pipes.discard(self.master_pipe)
+        self.master_pipe.close()
+
+    def kill(self):
+        '''
+        Terminate the worker (e.g., if it has stopped responding), keeping
+        the frame exports open for reuse by another worker.
+        '''
+        self._finished = True
+        if self._process:
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join()
+            self._process = None
+        self._close_master_pipe()
+
+    def get_available_video_modes(self, compact=False, **kwargs):
+        '''
+        If `compact` is `True`, the modes are transferred from the worker as
+        an encoded :class:`ModeTable` rather than as pickled dictionaries;
+        only the fields of the table are returned, with each device as a
+        plain string.
+        '''
+        result = self.request('get_available_video_modes', kwargs=kwargs,
+                              compact=compact).get()
+        if compact:
+            return ModeTable.decode(result).to_video_modes()
+        return result
 
     def get_video_mode_form(self, video_modes=None):
         if video_modes is None:
-            video_modes = self.get_available_video_modes(
-                    format_='YUY2')
+            video_modes = self.get_available_video_modes()
         video_mode_map = get_video_mode_map(video_modes)
         video_keys = sorted(video_mode_map.keys())
-        form = Form.of(Enum.named('video_mode').valued(
-                *video_keys).using(default=video_keys[0]))
+        form = Form.of(Enum.named('video_mode').valued(*video_keys).using(
+                default=get_default_video_key(video_mode_map)))
         return form
 
     def get_video_mode_enum(self, video_modes=None):
         if video_modes is None:
-            video_modes = self.get_available_video_modes(
-                    format_='YUY2')
+            video_modes = self.get_available_video_modes()
         video_mode_map = get_video_mode_map(video_modes)
         video_keys = sorted(video_mode_map.keys())
         return Enum.named('video_mode').valued(*video_keys)
 
 
+class GStreamerProcessPool(object):
+    '''
+    Pool of `size` warm :class:`GStreamerProcess` workers, i.e., with
+    GStreamer initialised, the device configuration resolved and the main
+    loop running.
+
+    Workers are handed out by :meth:`acquire` (or the :meth:`worker`
+    context manager) and are reset and recycled by :meth:`release`.
+    Workers that have died are replaced.
+    '''
+    process_class = GStreamerProcess
+
+    def __init__(self, size=2, warm_timeout=10.):
+        self.size = size
+        self.warm_timeout = warm_timeout
+        self._condition = threading.Condition()
+        self._idle = []
+        self._busy = set()
+        self._closed = False
+        for i in xrange(size):
+            self._idle.append(self._spawn())
+
+    def _spawn(self):
+        worker = self.process_class()
+        worker.ping(self.warm_timeout)
+        return worker
+
+    def _discard(self, worker):
+        try:
+            worker.join()
+        except Exception:
+            logging.warning('error joining worker', exc_info=True)
+
+    def acquire(self, timeout=None):
+        '''
+        Return a warm worker, waiting up to `timeout` seconds for one to
+        be released if all are busy.
+        '''
+        with self._condition:
+            deadline = None if timeout is None else time.time() + timeout
+            while not self._idle:
+                if self._closed:
+                    raise RuntimeError, 'Pool is closed'
+                remaining = None if deadline is None else deadline - \
+                        time.time()
+                if remaining is not None and remaining <= 0:
+                    raise RuntimeError, 'No worker available'
+                self._condition.wait(remaining)
+            worker = self._idle.pop()
+            self._busy.add(worker)
+        if not worker.is_alive():
+            with self._condition:
+                self._busy.discard(worker)
+            self._discard(worker)
+            worker = self._spawn()
+            with self._condition:
+                self._busy.add(worker)
+        return worker
+
+    def release(self, worker):
+        '''
+        Reset all pipelines of `worker` and return it to the pool, or
+        replace it if it has died.
+        '''
+        with self._condition:
+            self._busy.discard(worker)
+        try:
+            if not worker.is_alive():
+                raise RuntimeError, 'Worker died'
+            worker.reset_all()
+        except Exception:
+            logging.warning('replacing GStreamer worker', exc_info=True)
+            self._discard(worker)
+            worker = self._spawn()
+        with self._condition:
+            if self._closed:
+                self._discard(worker)
+                return
+            self._idle.append(worker)
+            self._condition.notify()
+
+    @contextmanager
+    def worker(self, timeout=None):
+        worker = self.acquire(timeout)
+        try:
+            yield worker
+        finally:
+            self.release(worker)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in idle:
+            self._discard(worker)
+
+
+class GStreamerSupervisor(object):
+    '''
+    Keep a :class:`GStreamerProcess` worker alive, restoring its pipelines
+    after a crash or hang (e.g., in a plugin of a flaky USB camera).
+
+    The worker is pinged every `heartbeat_interval` seconds, and each
+    pipeline command must complete within `command_timeout` seconds.  If
+    the worker dies, misses `heartbeat_misses` consecutive heartbeats or a
+    deadline, it is killed and a new worker is spawned, on which the
+    pipelines created (and started) through the supervisor are re-created
+    (and restarted) with the same device and caps.  Frame exports are
+    carried over to the new worker, so consumers keep the same
+    :class:`FrameExport`.
+
+    A pipeline created for an `output` without a caps string has its source
+    mode resolved once, before it is created (waiting up to
+    `probe_timeout` seconds for the devices to be probed), so that neither
+    its creation nor its replay probes the devices.
+
+    Each recovery is recorded in `recoveries` with its duration and the
+    pipelines that could not be restored (`failed`), and passed to
+    `on_recovery(recovery)` if set.  Pipelines that could not be restored
+    (e.g., a camera still re-enumerating) are retried on each following
+    heartbeat; see `unrestored`.
+    '''
+    process_class = GStreamerProcess
+
+    def __init__(self, heartbeat_interval=.5, heartbeat_timeout=1.,
+                 heartbeat_misses=3, command_timeout=5., warm_timeout=10.,
+                 probe_timeout=60., on_recovery=None):
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.heartbeat_misses = heartbeat_misses
+        self.probe_timeout = probe_timeout
+        self.command_timeout = command_timeout
+        self.warm_timeout = warm_timeout
+        self.on_recovery = on_recovery
+        # Commands replayed on a new worker, by pipeline name:
+        # `{'create': (method, kwargs), 'branches': {branch: (method,
+        # kwargs)}, 'started': bool}`.
+        self.pipelines = OrderedDict()
+        # Names of the pipelines not (yet) restored on the current worker.
+        self.unrestored = []
+        self.recoveries = []
+        self._lock = threading.RLock()
+        self.process = self._spawn()
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(target=self._run_heartbeat,
+                                           name='GStreamerSupervisor')
+        self._heartbeat.daemon = True
+        self._heartbeat.start()
+
+    def _spawn(self):
+        process = self.process_class()
+        process.command_timeout = self.command_timeout
+        process.probe_timeout = self.probe_timeout
+        process.ping(self.warm_timeout)
+        return process
+
+    def _run_heartbeat(self):
+        misses = 0
+        while True:
+            self._stopped.wait(self.heartbeat_interval)
+            if self._stopped.is_set():
+                break
+            with self._lock:
+                if self._stopped.is_set():
+                    break
+                process = self.process
+                try:
+                    process.ping(self.heartbeat_timeout)
+                    misses = 0
+                    if self.unrestored:
+                        self.unrestored = self._restore_pipelines(
+                                self.unrestored)
+                except Exception, why:
+                    # A worker busy with a long request (rather than hung)
+                    # answers a later heartbeat.
+                    misses += 1
+                    if (process.is_alive() and
+                            misses < self.heartbeat_misses):
+                        continue
+                    misses = 0
+                    try:
+                        self.recover('missed heartbeat (%s)' %
+                                     why.__class__.__name__)
+                    except Exception:
+                        # The worker that failed to start is not alive, so
+                        # the next heartbeat recovers again.
+                        logging.error('error restarting GStreamer worker',
+                                      exc_info=True)
+
+    def _is_failure(self, process, exception):
+        '''
+        Return `True` if `exception` (raised by a command to `process`)
+        means the worker has died or hung, rather than that the command
+        failed.
+        '''
+        return isinstance(exception, TimeoutError) or not process.is_alive()
+
+    def recover(self, reason):
+        '''
+        Replace the worker and restore its pipelines.
+        '''
+        with self._lock:
+            start = time.time()
+            logging.warning('restarting GStreamer worker: %s' % reason)
+            self.process.kill()
+            self.unrestored = self.pipelines.keys()
+            self.process = self._spawn()
+            self.unrestored = self._restore_pipelines(self.pipelines.keys())
+            recovery = {'time': start, 'reason': reason,
+                        'duration': time.time() - start,
+                        'pipelines': self.pipelines.keys(),
+                        'failed': list(self.unrestored)}
+            self.recoveries.append(recovery)
+            if self.unrestored:
+                logging.warning('GStreamer worker restarted in %.3f s, '
+                                'without pipelines %s' %
+                                (recovery['duration'],
+                                 ', '.join(self.unrestored)))
+            else:
+                logging.info('GStreamer worker restored in %.3f s' %
+                             recovery['duration'])
+        if self.on_recovery is not None:
+            self.on_recovery(recovery)
+        return recovery
+
+    def _restore_pipelines(self, names):
+        '''
+        Re-create (and restart) pipelines `names` on the current worker, and
+        return the names of those that could not be restored.
+        '''
+        failed = []
+        for name in names:
+            state = self.pipelines.get(name)
+            if state is None:
+                # Reset since.
+                continue
+            try:
+                method, kwargs = state['create']
+                getattr(self.process, method)(**kwargs)
+                for branch, (method, kwargs) in state['branches'].iteritems():
+                    getattr(self.process, method)(**kwargs)
+                if state['started']:
+                    self.process.start(name)
+            except Exception:
+                logging.warning('error restoring pipeline %s' % name,
+                                exc_info=True)
+                failed.append(name)
+                try:
+                    # Discard any part restored, keeping the frame exports
+                    # for the next attempt.
+                    self.process.request('reset', pipeline=name).get(
+                            self.command_timeout)
+                except Exception:
+                    pass
+        return failed
+
+    def _call(self, method, **kwargs):
+        '''
+        Call `method` of the worker, recovering and retrying once if the
+        worker has died or hung.
+        '''
+        with self._lock:
+            for attempt in (0, 1):
+                process = self.process
+                try:
+                    return getattr(process, method)(**kwargs)
+                except Exception, why:
+                    if attempt or not self._is_failure(process, why):
+                        raise
+                    self.recover('%s failed (%s)' %
+                                 (method, why.__class__.__name__))
+
+    def _create(self, method, pipeline, **kwargs):
+        with self._lock:
+            if pipeline in self.pipelines:
+                raise ValueError, 'Pipeline %s already exists' % pipeline
+            if (kwargs.get('output') is not None and
+                    kwargs['video_caps'][1] is None):
+                plan = self.process.plan_output(kwargs['video_caps'],
+                                                kwargs['output'])
+                kwargs['video_caps'] = (kwargs['video_caps'][0],
+                                        get_caps_string(plan.video_mode))
+            kwargs['pipeline'] = pipeline
+            result = self._call(method, **kwargs)
+            if method == 'create_frame_export':
+                # Carry the export over to replacement workers.
+                kwargs['frame_export'] = result
+            self.pipelines[pipeline] = {'create': (method, kwargs),
+                                        'branches': OrderedDict(),
+                                        'started': False}
+            return result
+
+    def create(self, video_caps, pipeline=DEFAULT_PIPELINE, **kwargs):
+        return self._create('create', pipeline, video_caps=video_caps,
+                            **kwargs)
+
+    def create_frame_export(self, video_caps, pipeline=DEFAULT_PIPELINE,
+                            **kwargs):
+        return self._create('create_frame_export', pipeline,
+                            video_caps=video_caps, **kwargs)
+
+    def _attach(self, method, branch, pipeline, **kwargs):
+        with self._lock:
+            kwargs.update(branch=branch, pipeline=pipeline)
+            result = self._call(method, **kwargs)
+            if method == 'attach_frame_export':
+                kwargs['frame_export'] = result
+            self.pipelines[pipeline]['branches'][branch] = method, kwargs
+            return result
+
+    def attach_branch(self, branch, pipeline=DEFAULT_PIPELINE, **kwargs):
+        return self._attach('attach_branch', branch, pipeline, **kwargs)
+
+    def attach_frame_export(self, branch, pipeline=DEFAULT_PIPELINE,
+                            **kwargs):
+        return self._attach('attach_frame_export', branch, pipeline,
+                            **kwargs)
+
+    def detach_branch(self, branch, pipeline=DEFAULT_PIPELINE):
+        with self._lock:
+            self._call('detach_branch', branch=branch, pipeline=pipeline)
+            self.pipelines[pipeline]['branches'].pop(branch, None)
+
+    def start(self, pipeline=DEFAULT_PIPELINE):
+        with self._lock:
+            self._call('start', pipeline=pipeline)
+            self.pipelines[pipeline]['started'] = True
+
+    def stop(self, pipeline=DEFAULT_PIPELINE):
+        with self._lock:
+            self._call('stop', pipeline=pipeline)
+            self.pipelines[pipeline]['started'] = False
+
+    def reset(self, pipeline=DEFAULT_PIPELINE):
+        with self._lock:
+            self._call('reset', pipeline=pipeline)
+            self.pipelines.pop(pipeline, None)
+            if pipeline in self.unrestored:
+                self.unrestored.remove(pipeline)
+
+    def status(self, pipeline=None):
+        return self._call('status', pipeline=pipeline)
+
+    def stats(self, pipeline=None):
+        return self._call('stats', pipeline=pipeline)
+
+    def close(self):
+        self._stopped.set()
+        self._heartbeat.join()
+        with self._lock:
+            self.pipelines.clear()
+            self.unrestored = []
+            self.process.join()
+
+
 if __name__ == '__main__':
     logging.basicConfig(format='[%(levelname)s] %(message)s', loglevel=logging.INFO)
     logging.info('Using GStreamerProcess')
     p = GStreamerProcess()
-    pprint(p.get_available_video_modes(format_='YUY2'))
+    pprint(p.get_available_video_modes())
     try:
         p.run(15)
     except (RuntimeError, DeviceNotFound), why:
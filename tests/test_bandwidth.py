@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gst_video_source_caps_query.bandwidth import (allocate_modes,
+                                                   estimate_bandwidth,
+                                                   get_bus_budget, get_usb_bus)
+
+
+def get_mode(fourcc, width, height, fps):
+    return {'fourcc': fourcc, 'width': width, 'height': height,
+            'framerate': (fps, 1)}
+
+
+class SysfsTreeTestCase(unittest.TestCase):
+    '''
+    Temporary sysfs tree with a `/dev/v4l/by-id`-style link for each
+    camera.
+    '''
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='sysfs_')
+        self.sysfs_root = os.path.join(self.root, 'sys')
+        self.by_id_dir = os.path.join(self.root, 'by-id')
+        os.makedirs(self.by_id_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def add_camera(self, name, node, bus=None, port=1, speed='480'):
+        '''
+        Add camera `name` with device node `node` (e.g., `video0`), on USB
+        bus `bus` (e.g., `usb1`), or not on USB if `bus` is `None`.
+        '''
+        class_dir = os.path.join(self.sysfs_root, 'class', 'video4linux',
+                                 node)
+        os.makedirs(class_dir)
+        if bus is not None:
+            bus_dir = os.path.join(self.sysfs_root, 'devices', 'pci0000:00',
+                                   '0000:00:14.0', bus)
+            port_dir = '%s-%d' % (bus[3:], port)
+            interface_dir = os.path.join(bus_dir, port_dir, port_dir + ':1.0')
+            os.makedirs(interface_dir)
+            with open(os.path.join(bus_dir, 'speed'), 'w') as f:
+                f.write(speed + '\n')
+            os.symlink(interface_dir, os.path.join(class_dir, 'device'))
+        device = os.path.join(self.by_id_dir, name)
+        os.symlink(os.path.join(self.root, 'dev', node), device)
+        return device
+
+
+class TestGetUsbBus(SysfsTreeTestCase):
+    def test_usb_device(self):
+        device = self.add_camera('usb-cam0', 'video0', 'usb1')
+        self.assertEqual(get_usb_bus(device, self.sysfs_root), ('usb1', 480.))
+
+    def test_bus_speed(self):
+        device = self.add_camera('usb-cam0', 'video0', 'usb2', speed='5000')
+        self.assertEqual(get_usb_bus(device, self.sysfs_root),
+                         ('usb2', 5000.))
+
+    def test_not_usb(self):
+        device = self.add_camera('pci-cam0', 'video0')
+        self.assertEqual(get_usb_bus(device, self.sysfs_root), None)
+
+
+class TestAllocateModes(SysfsTreeTestCase):
+    def setUp(self):
+        super(TestAllocateModes, self).setUp()
+        # Within the 480 Mbit/s budget alone, but not two of them.
+        self.raw_720p = get_mode('YUY2', 1280, 720, 10)
+        self.raw_vga = get_mode('YUY2', 640, 480, 30)
+        self.mjpg_720p = get_mode('MJPG', 1280, 720, 30)
+        self.modes = [self.raw_720p, self.raw_vga, self.mjpg_720p,
+                      get_mode('YUY2', 1280, 720, 30)]
+
+    def test_shared_bus_within_budget(self):
+        devices = [self.add_camera('usb-cam%d' % i, 'video%d' % i, 'usb1',
+                                   port=i + 1) for i in range(3)]
+        allocation = allocate_modes(dict((d, self.modes) for d in devices),
+                                    self.sysfs_root)
+        self.assertEqual(sorted(allocation.modes), sorted(devices))
+        usage = allocation.usage['usb1']
+        self.assertEqual(sorted(usage['devices']), sorted(devices))
+        self.assertEqual(usage['budget'], get_bus_budget(480.))
+        used = sum(estimate_bandwidth(m) for m in allocation.modes.values())
+        self.assertAlmostEqual(usage['used'], used)
+        self.assertTrue(used <= usage['budget'])
+
+    def test_single_device_gets_best_mode(self):
+        device = self.add_camera('usb-cam0', 'video0', 'usb1')
+        allocation = allocate_modes({device: self.modes}, self.sysfs_root,
+                                    quality=lambda m: m['width'] *
+                                    m['height'] * m['framerate'][0])
+        # Raw 720p at 30 fps exceeds the bus on its own.
+        self.assertEqual(allocation.modes[device], self.mjpg_720p)
+
+    def test_separate_buses(self):
+        device_0 = self.add_camera('usb-cam0', 'video0', 'usb1')
+        device_1 = self.add_camera('usb-cam1', 'video1', 'usb2')
+        quality = lambda m: m['width'] * m['height'] * m['framerate'][0]
+        allocation = allocate_modes({device_0: self.modes,
+                                     device_1: self.modes}, self.sysfs_root,
+                                    quality=quality)
+        self.assertEqual(sorted(allocation.usage), ['usb1', 'usb2'])
+        self.assertEqual(allocation.modes[device_0], self.mjpg_720p)
+        self.assertEqual(allocation.modes[device_1], self.mjpg_720p)
+
+    def test_not_usb_unconstrained(self):
+        device = self.add_camera('pci-cam0', 'video0')
+        allocation = allocate_modes({device: self.modes}, self.sysfs_root,
+                                    quality=lambda m: estimate_bandwidth(m))
+        self.assertEqual(allocation.modes[device],
+                         get_mode('YUY2', 1280, 720, 30))
+        self.assertEqual(allocation.usage, {})
+
+    def test_budgets(self):
+        device = self.add_camera('usb-cam0', 'video0', 'usb1')
+        allocation = allocate_modes({device: self.modes}, self.sysfs_root,
+                                    budgets={'usb1': 2e7},
+                                    quality=lambda m: m['width'])
+        self.assertEqual(allocation.usage['usb1']['budget'], 2e7)
+        self.assertEqual(allocation.modes[device], self.mjpg_720p)
+
+    def test_infeasible(self):
+        device = self.add_camera('usb-cam0', 'video0', 'usb1')
+        self.assertRaises(ValueError, allocate_modes, {device: self.modes},
+                          self.sysfs_root, budgets={'usb1': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
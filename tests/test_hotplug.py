@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from gst_video_source_caps_query.backends import SyntheticBackend
+from gst_video_source_caps_query.gst_video_source_caps_query import \
+        GstVideoSourceManager
+from gst_video_source_caps_query.hotplug import DeviceWatcher
+
+
+class DirectoryBackend(SyntheticBackend):
+    '''
+    Synthetic devices listed as the files of `by_id_dir`, identified by
+    their contents.
+    '''
+    def __init__(self, by_id_dir):
+        super(DirectoryBackend, self).__init__(caps_count=4)
+        self.by_id_dir = by_id_dir
+        self.probed = []
+
+    def list_devices(self):
+        return [os.path.join(self.by_id_dir, name)
+                for name in sorted(os.listdir(self.by_id_dir))]
+
+    def get_identity(self, video_device):
+        with open(video_device) as f:
+            return {'name': video_device, 'serial': f.read()}
+
+    def probe(self, video_device):
+        self.probed.append(video_device)
+        return super(DirectoryBackend, self).probe(video_device)
+
+
+class TestDeviceWatcher(unittest.TestCase):
+    def setUp(self):
+        self.by_id_dir = tempfile.mkdtemp(prefix='by-id_')
+        self.backend = DirectoryBackend(self.by_id_dir)
+        self.add_device('usb-cam0')
+        self.manager = GstVideoSourceManager(cache=False,
+                                             backend=self.backend)
+        self.manager.get_fingerprints()
+        self.watcher = DeviceWatcher(self.manager, interval=.01,
+                                     use_inotify=False)
+        self.changes = []
+        self.changed = threading.Event()
+        self.manager.device_change_callbacks.append(self.on_change)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.by_id_dir)
+
+    def add_device(self, name, serial='0'):
+        path_ = os.path.join(self.by_id_dir, name)
+        with open(path_, 'w') as f:
+            f.write(serial)
+        return path_
+
+    def on_change(self, added, removed, changed):
+        self.changes.append((added, removed, changed))
+        self.changed.set()
+
+    def test_poll_unchanged(self):
+        self.assertEqual(self.watcher.poll(), ([], [], []))
+        self.assertEqual(self.changes, [])
+
+    def test_poll_added(self):
+        del self.backend.probed[:]
+        device = self.add_device('usb-cam1')
+        self.assertEqual(self.watcher.poll(), ([device], [], []))
+        # Only the new device is probed.
+        self.assertEqual(self.backend.probed, [device])
+        self.assertEqual(self.changes, [([device], [], [])])
+        self.assertEqual(sorted(self.manager.capabilities),
+                         self.backend.list_devices())
+
+    def test_poll_removed(self):
+        device = os.path.join(self.by_id_dir, 'usb-cam0')
+        os.remove(device)
+        self.assertEqual(self.watcher.poll(), ([], [device], []))
+        self.assertEqual(self.manager.capabilities, {})
+
+    def test_poll_changed(self):
+        del self.backend.probed[:]
+        device = self.add_device('usb-cam0', serial='1')
+        self.assertEqual(self.watcher.poll(), ([], [], [device]))
+        self.assertEqual(self.backend.probed, [device])
+
+    def test_polling_thread(self):
+        self.watcher.start()
+        device = self.add_device('usb-cam1')
+        self.assertTrue(self.changed.wait(5))
+        self.assertEqual(self.changes[0], ([device], [], []))
+        self.changed.clear()
+        os.remove(device)
+        self.assertTrue(self.changed.wait(5))
+        self.assertEqual(self.changes[1], ([], [device], []))
+
+
+if __name__ == '__main__':
+    unittest.main()